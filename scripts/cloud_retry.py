@@ -0,0 +1,259 @@
+"""
+Shared retry and throttling policy for every cloud API call the CLI makes.
+
+Calls to boto3, PyGithub, requests and the wsk CLI go through call_with_retry,
+which classifies failures the same way for every platform:
+
+    throttle     -- 429, TooManyRequestsException, GitHub (secondary) rate limits
+    conflict     -- the resource is busy, e.g. a Lambda update still in progress
+    transient    -- 5xx, timeouts and dropped connections
+    not_found    -- 404 / ResourceNotFoundException, never retried
+    precondition -- 412 / PreconditionFailed, or a GitHub 409 (the sha a write was
+                    based on is stale): a conditional write lost a race, never
+                    retried
+    fatal        -- anything else, never retried
+
+Retryable failures back off exponentially with full jitter (or for as long as
+Retry-After asks). Every call first takes a token from its platform's token
+bucket, and the counters are printed in the run summary.
+"""
+
+import random
+import re
+import subprocess
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+
+# Sustained calls per second and burst size for each platform
+RATE_LIMITS = {
+    'lambda': (10.0, 20),
+    'github': (2.0, 10),
+    'openwhisk': (10.0, 20),
+    's3': (50.0, 100),
+}
+
+THROTTLE_CODES = {
+    'TooManyRequestsException', 'ThrottlingException', 'Throttling', 'ThrottledException',
+    'RequestLimitExceeded', 'SlowDown', 'RequestThrottled', 'ProvisionedThroughputExceededException',
+}
+CONFLICT_CODES = {'ResourceConflictException', 'ResourceInUseException', 'OperationAbortedException'}
+NOT_FOUND_CODES = {'ResourceNotFoundException', 'NoSuchKey', 'NoSuchBucket', 'NotFound', '404'}
+PRECONDITION_CODES = {'PreconditionFailed', '412'}
+TRANSIENT_CODES = {'ServiceException', 'ServiceUnavailable', 'InternalError', 'RequestTimeout', 'EC2ThrottledException'}
+
+RETRYABLE = {'throttle', 'conflict', 'transient'}
+
+WSK_TRANSACTION_ID = re.compile(r'\(code [^)]*\)')
+
+
+class CommandError(Exception):
+    """A wsk (or other CLI) command exited with a non-zero status"""
+
+    def __init__(self, cmd, returncode, stderr):
+        super().__init__(f"'{cmd}' exited with {returncode}: {stderr.strip()}")
+        self.returncode = returncode
+        self.stderr = stderr
+
+
+class TokenBucket:
+    """Blocking token bucket: rate tokens per second, up to capacity"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available. Returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+_buckets = {platform: TokenBucket(*limits) for platform, limits in RATE_LIMITS.items()}
+_stats = defaultdict(lambda: defaultdict(float))
+_stats_lock = threading.Lock()
+
+
+def _count(platform, counter, amount=1):
+    with _stats_lock:
+        _stats[platform][counter] += amount
+
+
+def _status_and_code(exc):
+    """Returns (HTTP status, error code, message) for boto3, PyGithub and requests errors"""
+    # botocore ClientError
+    response = getattr(exc, 'response', None)
+    if isinstance(response, dict) and 'Error' in response:
+        status = response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+        return status, response['Error'].get('Code'), response['Error'].get('Message', '')
+    # PyGithub GithubException
+    if hasattr(exc, 'status') and hasattr(exc, 'data'):
+        data = exc.data if isinstance(exc.data, dict) else {}
+        return exc.status, None, str(data.get('message', exc.data))
+    # requests HTTPError
+    if isinstance(response, requests.Response):
+        return response.status_code, None, response.text
+    return None, None, str(exc)
+
+
+def classify_error(exc):
+    """Returns 'throttle', 'conflict', 'transient', 'not_found', 'precondition' or 'fatal'"""
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return 'transient'
+    if type(exc).__name__ in ('EndpointConnectionError', 'ConnectTimeoutError', 'ReadTimeoutError',
+                              'ConnectionClosedError'):
+        return 'transient'
+
+    if isinstance(exc, CommandError):
+        # wsk ends its errors with a hex transaction id, "(code 7a4c1409...)", which
+        # can contain any status code as digits; match the message text first and
+        # whole-word status codes only outside that suffix
+        stderr = WSK_TRANSACTION_ID.sub('', exc.stderr.lower())
+        if 'does not exist' in stderr or 'not found' in stderr:
+            return 'not_found'
+        if 'already exists' in stderr or 'conflict' in stderr:
+            return 'conflict'
+        if 'too many requests' in stderr:
+            return 'throttle'
+        if 'timed out' in stderr or 'connection refused' in stderr:
+            return 'transient'
+        if re.search(r'\b429\b', stderr):
+            return 'throttle'
+        if re.search(r'\b409\b', stderr):
+            return 'conflict'
+        if re.search(r'\b404\b', stderr):
+            return 'not_found'
+        if re.search(r'\b50[234]\b', stderr):
+            return 'transient'
+        return 'fatal'
+
+    status, code, message = _status_and_code(exc)
+    if code in THROTTLE_CODES or status == 429:
+        return 'throttle'
+    if status == 403 and 'rate limit' in message.lower():
+        return 'throttle'
+    if status == 409 and code is None and hasattr(exc, 'data'):
+        # GitHub answers 409 when a contents write names a stale blob sha;
+        # resending the same sha cannot succeed
+        return 'precondition'
+    if code in CONFLICT_CODES or status == 409:
+        return 'conflict'
+    if code in NOT_FOUND_CODES or status == 404:
+        return 'not_found'
+    if code in PRECONDITION_CODES or status == 412:
+        return 'precondition'
+    if code in TRANSIENT_CODES or (status is not None and status >= 500):
+        return 'transient'
+    return 'fatal'
+
+
+def is_not_found(exc):
+    return classify_error(exc) == 'not_found'
+
+
+def is_precondition_failed(exc):
+    return classify_error(exc) == 'precondition'
+
+
+def _retry_after(exc):
+    """Seconds asked for by a Retry-After (or GitHub rate limit reset) header, if any"""
+    headers = getattr(exc, 'headers', None)
+    response = getattr(exc, 'response', None)
+    if headers is None and isinstance(response, requests.Response):
+        headers = response.headers
+    if not headers:
+        return None
+    if headers.get('Retry-After'):
+        try:
+            return float(headers['Retry-After'])
+        except ValueError:
+            return None
+    if headers.get('x-ratelimit-remaining') == '0' and headers.get('x-ratelimit-reset'):
+        return max(0.0, float(headers['x-ratelimit-reset']) - time.time())
+    return None
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def call_with_retry(platform, fn, *args, **kwargs):
+    """
+    Call fn(*args, **kwargs) under the platform's rate limit, retrying throttled,
+    conflicting and transient failures. The last error is re-raised.
+    """
+    bucket = _buckets.get(platform)
+    for attempt in range(MAX_ATTEMPTS):
+        if bucket:
+            _count(platform, 'throttle_wait_s', bucket.acquire())
+        _count(platform, 'calls')
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            kind = classify_error(e)
+            if kind not in RETRYABLE or attempt == MAX_ATTEMPTS - 1:
+                if kind not in ('not_found', 'precondition'):
+                    _count(platform, 'failures')
+                raise
+            _count(platform, kind)
+            _count(platform, 'retries')
+            delay = _retry_after(e)
+            if delay is None:
+                delay = backoff_delay(attempt)
+            _count(platform, 'backoff_s', delay)
+            time.sleep(delay)
+
+
+def run_command(cmd, env=None, platform='openwhisk'):
+    """Run a shell command under the retry policy, raising CommandError on a non-zero exit"""
+    def run():
+        result = subprocess.run(cmd, shell=True, capture_output=True, text=True, env=env)
+        if result.returncode != 0:
+            raise CommandError(cmd, result.returncode, result.stderr or result.stdout)
+        return result
+    return call_with_retry(platform, run)
+
+
+def retry_stats():
+    """Returns a copy of the counters: {platform: {counter: value}}"""
+    with _stats_lock:
+        return {platform: dict(counters) for platform, counters in _stats.items()}
+
+
+def reset_retry_stats():
+    """Clear the counters, e.g. between the deploys of a long-running watch"""
+    with _stats_lock:
+        _stats.clear()
+
+
+def retry_summary():
+    """One line per platform with its call, retry and throttling counters"""
+    lines = []
+    for platform, c in sorted(retry_stats().items()):
+        lines.append(
+            f"{platform}: {int(c.get('calls', 0))} calls, {int(c.get('retries', 0))} retries "
+            f"({int(c.get('throttle', 0))} throttled, {int(c.get('conflict', 0))} conflicts, "
+            f"{int(c.get('transient', 0))} transient), {int(c.get('failures', 0))} failures, "
+            f"{c.get('backoff_s', 0):.1f}s backing off, {c.get('throttle_wait_s', 0):.1f}s rate limited"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,263 @@
+"""
+Credential resolution for the placeholders in FaaSr workflow files.
+
+ComputeServers and DataStores reference their credentials by placeholder, e.g.
+"AccessKey": "My_Minio_Bucket_ACCESS_KEY". Any field whose value is
+{EntryName}_TOKEN, _ACCESS_KEY, _SECRET_KEY or _API_KEY is a placeholder, for
+any server or store name. A placeholder takes the value of the first name
+that resolves, the placeholder itself and then the platform's conventional
+name (GITHUB_TOKEN, AWS_ACCESS_KEY_ID, OW_API_KEY, MINIO_ACCESS_KEY, ...).
+Each name is looked up in:
+
+    1. the environment
+    2. AWS Secrets Manager, when FAASR_AWS_SECRETS_REGION is set: every name
+       missing from the environment is fetched with BatchGetSecretValue, up to
+       20 per call
+    3. Google Secret Manager, when FAASR_GCP_PROJECT is set (needs
+       google-cloud-secret-manager)
+
+Secret names may carry a prefix (FAASR_AWS_SECRET_PREFIX, FAASR_GCP_SECRET_PREFIX),
+the same one given to sync-secret.yml. Answers, including misses, are cached
+in-process for FAASR_SECRET_CACHE_TTL seconds and shared by every action and
+workflow resolved in the same process.
+"""
+
+import copy
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+from cloud_retry import call_with_retry, classify_error
+
+try:
+    from google.cloud import secretmanager
+except ImportError:
+    secretmanager = None
+
+PLACEHOLDER_SUFFIXES = ('TOKEN', 'ACCESS_KEY', 'SECRET_KEY', 'API_KEY')
+SECRET_CACHE_TTL = 300
+AWS_BATCH_SIZE = 20
+GCP_MAX_WORKERS = 8
+
+# Conventional environment variables, by (section, FaaSType, suffix)
+ENV_ALIASES = {
+    ('ComputeServers', 'githubactions', 'TOKEN'): 'GITHUB_TOKEN',
+    ('ComputeServers', 'lambda', 'ACCESS_KEY'): 'AWS_ACCESS_KEY_ID',
+    ('ComputeServers', 'lambda', 'SECRET_KEY'): 'AWS_SECRET_ACCESS_KEY',
+    ('ComputeServers', 'openwhisk', 'API_KEY'): 'OW_API_KEY',
+    ('DataStores', None, 'ACCESS_KEY'): 'MINIO_ACCESS_KEY',
+    ('DataStores', None, 'SECRET_KEY'): 'MINIO_SECRET_KEY',
+}
+
+FAAS_TYPES = {
+    'lambda': 'lambda', 'aws_lambda': 'lambda', 'aws': 'lambda',
+    'githubactions': 'githubactions', 'github_actions': 'githubactions', 'github': 'githubactions',
+    'openwhisk': 'openwhisk', 'open_whisk': 'openwhisk', 'ow': 'openwhisk',
+}
+
+
+class CredentialProvider:
+    """
+    Resolves credential names from the environment and cloud secret managers,
+    caching every answer for ttl seconds
+
+    Arguments:
+        aws_region: Secrets Manager region, or None to skip AWS
+        aws_prefix: prefix of the Secrets Manager secret names
+        gcp_project: GCP project, or None to skip Google Secret Manager
+        gcp_prefix: prefix of the Google Secret Manager secret names
+        ttl: seconds an answer is reused
+        secretsmanager_client: boto3 client to use instead of creating one (e.g. under moto)
+    """
+
+    def __init__(self, aws_region=None, aws_prefix='', gcp_project=None, gcp_prefix='', ttl=SECRET_CACHE_TTL,
+                 secretsmanager_client=None):
+        self.aws_region = aws_region
+        self.aws_prefix = aws_prefix
+        self.gcp_project = gcp_project
+        self.gcp_prefix = gcp_prefix
+        self.ttl = ttl
+        self._secretsmanager = secretsmanager_client
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, source, name):
+        with self._lock:
+            entry = self._cache.get((source, name))
+        if entry and time.time() - entry[1] < self.ttl:
+            return True, entry[0]
+        return False, None
+
+    def _store(self, source, values):
+        now = time.time()
+        with self._lock:
+            for name, value in values.items():
+                self._cache[(source, name)] = (value, now)
+
+    def _fetch_aws(self, names):
+        """BatchGetSecretValue for names, AWS_BATCH_SIZE at a time. Returns {name: value or None}."""
+        if self._secretsmanager is None:
+            self._secretsmanager = boto3.client(
+                'secretsmanager',
+                aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+                aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+                region_name=self.aws_region
+            )
+        found = dict.fromkeys(names)
+        for i in range(0, len(names), AWS_BATCH_SIZE):
+            batch = {f"{self.aws_prefix}{name}": name for name in names[i:i + AWS_BATCH_SIZE]}
+            response = call_with_retry('secretsmanager', self._secretsmanager.batch_get_secret_value,
+                                       SecretIdList=list(batch))
+            for secret in response.get('SecretValues', []):
+                if secret['Name'] in batch:
+                    found[batch[secret['Name']]] = secret.get('SecretString')
+            for error in response.get('Errors', []):
+                if error.get('ErrorCode') != 'ResourceNotFoundException':
+                    print(f"Warning: could not read secret {error.get('SecretId')} from AWS Secrets Manager: "
+                          f"{error.get('ErrorCode')} {error.get('Message', '')}")
+        return found
+
+    def _fetch_gcp(self, names):
+        """Latest version of each secret, fetched concurrently. Returns {name: value or None}."""
+        if secretmanager is None:
+            print("Warning: FAASR_GCP_PROJECT is set but google-cloud-secret-manager is not installed")
+            return dict.fromkeys(names)
+        client = secretmanager.SecretManagerServiceClient()
+
+        def access(name):
+            path = f"projects/{self.gcp_project}/secrets/{self.gcp_prefix}{name}/versions/latest"
+            try:
+                return client.access_secret_version(name=path).payload.data.decode('utf-8')
+            except Exception as e:
+                if type(e).__name__ != 'NotFound' and classify_error(e) != 'not_found':
+                    print(f"Warning: could not read secret {name} from Google Secret Manager: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=GCP_MAX_WORKERS) as executor:
+            return dict(zip(names, executor.map(access, names)))
+
+    def resolve(self, names):
+        """
+        Resolve many credential names at once: the environment first, then one
+        batch per secret manager for whatever is still missing
+
+        Returns:
+            dict: {name: value or None}
+        """
+        resolved = {name: os.getenv(name) or None for name in names}
+        sources = [('aws', self.aws_region, self._fetch_aws), ('gcp', self.gcp_project, self._fetch_gcp)]
+        for source, enabled, fetch in sources:
+            if not enabled:
+                continue
+            missing = []
+            for name in names:
+                if resolved[name] is not None:
+                    continue
+                hit, value = self._cached(source, name)
+                if hit:
+                    resolved[name] = value
+                else:
+                    missing.append(name)
+            if missing:
+                values = fetch(missing)
+                self._store(source, values)
+                resolved.update({name: value for name, value in values.items() if value is not None})
+        return resolved
+
+    def get(self, name, *aliases):
+        """Resolve one name, falling back to each alias in turn"""
+        values = self.resolve([name, *aliases])
+        return next((values[n] for n in (name, *aliases) if values[n] is not None), None)
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_credential_provider():
+    """Returns the process-wide provider configured from the FAASR_* environment variables"""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = CredentialProvider(
+                aws_region=os.getenv('FAASR_AWS_SECRETS_REGION'),
+                aws_prefix=os.getenv('FAASR_AWS_SECRET_PREFIX', ''),
+                gcp_project=os.getenv('FAASR_GCP_PROJECT'),
+                gcp_prefix=os.getenv('FAASR_GCP_SECRET_PREFIX', ''),
+                ttl=float(os.getenv('FAASR_SECRET_CACHE_TTL', SECRET_CACHE_TTL))
+            )
+        return _provider
+
+
+def find_placeholders(workflow_data):
+    """
+    Returns every credential placeholder in ComputeServers and DataStores as
+    (section, entry name, field, placeholder, conventional env variable or None)
+    """
+    found = []
+    for section in ('ComputeServers', 'DataStores'):
+        for entry_name, config in workflow_data.get(section, {}).items():
+            faas_type = FAAS_TYPES.get(str(config.get('FaaSType', '')).lower()) if section == 'ComputeServers' else None
+            for field, value in config.items():
+                for suffix in PLACEHOLDER_SUFFIXES:
+                    if value == f"{entry_name}_{suffix}":
+                        found.append((section, entry_name, field, value, ENV_ALIASES.get((section, faas_type, suffix))))
+    return found
+
+
+def resolve_placeholders(workflow_data, provider=None):
+    """
+    Resolve all placeholders of a workflow in one batch
+
+    Returns:
+        dict: {placeholder: value} for the placeholders that could be resolved
+    """
+    provider = provider or get_credential_provider()
+    placeholders = find_placeholders(workflow_data)
+    names = {p[3] for p in placeholders} | {p[4] for p in placeholders if p[4]}
+    values = provider.resolve(sorted(names))
+
+    credentials = {}
+    for section, entry_name, field, placeholder, alias in placeholders:
+        value = values.get(placeholder) or (values.get(alias) if alias else None)
+        if value is not None:
+            credentials[placeholder] = value
+
+    unresolved = sorted({p[3] for p in placeholders} - set(credentials))
+    if unresolved:
+        print(f"Warning: no value found for credential placeholder(s): {', '.join(unresolved)}")
+    return credentials
+
+
+def get_datastore_credentials(store_name, store_config, provider=None):
+    """
+    Returns (access key, secret key) of a DataStore. A literal AccessKey/SecretKey
+    in the store entry is used as is; a placeholder resolves as {Store}_ACCESS_KEY
+    / {Store}_SECRET_KEY, then MINIO_ACCESS_KEY / MINIO_SECRET_KEY. Missing keys
+    are None.
+    """
+    provider = provider or get_credential_provider()
+    fields = (('AccessKey', 'ACCESS_KEY'), ('SecretKey', 'SECRET_KEY'))
+    names = [f"{store_name}_{suffix}" for _, suffix in fields]
+    values = provider.resolve(names + [ENV_ALIASES[('DataStores', None, suffix)] for _, suffix in fields])
+
+    keys = []
+    for (field, suffix), name in zip(fields, names):
+        value = store_config.get(field)
+        if value and value != name:
+            keys.append(value)
+        else:
+            keys.append(values[name] or values[ENV_ALIASES[('DataStores', None, suffix)]])
+    return tuple(keys)
+
+
+def substitute_credentials(workflow_data, credentials):
+    """Returns a deep copy of the workflow with resolved placeholders replaced by their values"""
+    workflow = copy.deepcopy(workflow_data)
+    for section, entry_name, field, placeholder, alias in find_placeholders(workflow):
+        if placeholder in credentials:
+            workflow[section][entry_name][field] = credentials[placeholder]
+    return workflow
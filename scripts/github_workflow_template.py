@@ -0,0 +1,216 @@
+"""
+GitHub Actions workflow files for FaaSr actions.
+
+Each action gets one workflow_dispatch workflow. Its job is built from the
+action's runner settings, which are read from an optional "RunnerConfig" object
+on the GitHub ComputeServer and can be overridden by a "RunnerConfig" object on
+the action in ActionList. Every generated file starts with a marker line naming
+the workflow, so reconcile never deletes a file it did not generate.
+
+Runner settings:
+
+    RunsOn          -- runner label or list of labels, e.g. ["self-hosted", "linux"]
+                       (default "ubuntu-latest")
+    TimeoutMinutes  -- job timeout-minutes (default: GitHub's own limit)
+    Concurrency     -- put each action instance in its own concurrency group
+                       (default false). GitHub then runs one run of the group
+                       at a time and keeps at most one pending: a newer trigger
+                       cancels the pending one, so repeated triggers of the
+                       same instance (e.g. one per fan-in predecessor) collapse
+                       into fewer runs. An unranked action has one instance
+                       per invocation and is grouped by InvocationID. A ranked
+                       action is grouped by InvocationID and FunctionRank, and
+                       is not grouped at all when a trigger does not pass both
+                       in OVERWRITTEN, so ranked instances never cancel each
+                       other. A trigger without an InvocationID is not grouped
+                       either.
+    ImageCache      -- how the action image is made available:
+                       "none"          -- job container, pulled by the runner (default)
+                       "pull"          -- reuse an image already on the runner and only
+                                          pull when missing (self-hosted runners with a
+                                          warm image cache)
+                       "actions-cache" -- keep the image as a tarball in actions/cache,
+                                          keyed by the image reference
+"""
+
+import json
+
+DEFAULT_RUNNER_CONFIG = {
+    'RunsOn': 'ubuntu-latest',
+    'TimeoutMinutes': None,
+    'Concurrency': False,
+    'ImageCache': 'none',
+}
+IMAGE_CACHE_MODES = ('none', 'pull', 'actions-cache')
+
+IMAGE_TARBALL = '/tmp/faasr-image.tar'
+
+# First line of every generated workflow file. Reconcile only deletes files that
+# carry it for the workflow being registered, together with the generated job.
+GENERATED_MARKER = "# Generated by FaaSr for workflow {}; do not edit"
+GENERATED_JOB = "  run_docker_image:"
+
+# Environment handed to faasr_entry.py
+ACTION_ENV = ['TOKEN', 'SECRET_PAYLOAD', 'OVERWRITTEN', 'PAYLOAD_URL']
+
+# One concurrency group per invocation for unranked actions, and per invocation
+# and rank for ranked ones. Either falls back to the run id (no grouping) when
+# the trigger did not pass the fields the group is keyed by.
+_OVERWRITTEN = "fromJSON(github.event.inputs.OVERWRITTEN)"
+CONCURRENCY_GROUP = f"${{{{ github.workflow }}}}-${{{{ {_OVERWRITTEN}.InvocationID || github.run_id }}}}"
+RANKED_CONCURRENCY_GROUP = (
+    f"${{{{ github.workflow }}}}-${{{{ ({_OVERWRITTEN}.InvocationID && {_OVERWRITTEN}.FunctionRank)"
+    f" && format('{{0}}-{{1}}', {_OVERWRITTEN}.InvocationID, {_OVERWRITTEN}.FunctionRank)"
+    f" || github.run_id }}}}"
+)
+
+
+def get_runner_config(workflow_data, action_name):
+    """
+    Returns the runner settings of an action: defaults, then the ComputeServer's
+    RunnerConfig, then the action's own RunnerConfig
+
+    Raises:
+        ValueError: on an unknown setting name or a setting of the wrong type
+    """
+    action_data = workflow_data['ActionList'][action_name]
+    server_config = workflow_data['ComputeServers'][action_data['FaaSServer']]
+
+    config = dict(DEFAULT_RUNNER_CONFIG)
+    for overrides in (server_config.get('RunnerConfig', {}), action_data.get('RunnerConfig', {})):
+        unknown = set(overrides) - set(DEFAULT_RUNNER_CONFIG)
+        if unknown:
+            raise ValueError(f"unknown RunnerConfig setting(s) for '{action_name}': {', '.join(sorted(unknown))}")
+        config.update(overrides)
+
+    runs_on = config['RunsOn']
+    if not (isinstance(runs_on, str) and runs_on) and not (
+            isinstance(runs_on, list) and runs_on and all(isinstance(label, str) and label for label in runs_on)):
+        raise ValueError(f"RunsOn for '{action_name}' must be a runner label or a non-empty list of labels")
+    timeout = config['TimeoutMinutes']
+    if timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, int) or timeout <= 0):
+        raise ValueError(f"TimeoutMinutes for '{action_name}' must be a positive whole number of minutes")
+    if not isinstance(config['Concurrency'], bool):
+        raise ValueError(f"Concurrency for '{action_name}' must be true or false")
+    if config['ImageCache'] not in IMAGE_CACHE_MODES:
+        raise ValueError(f"ImageCache for '{action_name}' must be one of {', '.join(IMAGE_CACHE_MODES)}")
+    return config
+
+
+def is_generated_workflow(content, workflow_name):
+    """True if content is a workflow file generated for workflow_name"""
+    lines = content.splitlines()
+    return bool(lines) and lines[0] == GENERATED_MARKER.format(workflow_name) and GENERATED_JOB in lines
+
+
+def _runs_on(labels):
+    # A list becomes a YAML flow sequence: ["self-hosted", "linux"]
+    return json.dumps(labels) if isinstance(labels, list) else labels
+
+
+def _job_header(runner_config):
+    lines = [f"    runs-on: {_runs_on(runner_config['RunsOn'])}"]
+    if runner_config['TimeoutMinutes']:
+        lines.append(f"    timeout-minutes: {runner_config['TimeoutMinutes']}")
+    return lines
+
+
+def _env_block(locator_var):
+    pad = ' ' * 6
+    lines = [
+        f"{pad}TOKEN: ${{{{ secrets.PAT }}}}",
+        f"{pad}SECRET_PAYLOAD: ${{{{ secrets.SECRET_PAYLOAD }}}}",
+        f"{pad}OVERWRITTEN: ${{{{ github.event.inputs.OVERWRITTEN }}}}",
+        f"{pad}PAYLOAD_URL: ${{{{ github.event.inputs.PAYLOAD_URL }}}}",
+    ]
+    if locator_var:
+        lines.append(f"{pad}PAYLOAD_LOCATOR: ${{{{ vars.{locator_var} }}}}")
+    return lines
+
+
+def _image_steps(container_image, image_cache):
+    """Steps that make the image available on the runner before it is run"""
+    if image_cache == 'pull':
+        return [
+            "    - name: Pull image if not cached",
+            "      run: |",
+            f"        docker image inspect {container_image} > /dev/null 2>&1 || docker pull {container_image}",
+        ]
+    return [
+        "    - name: Restore image cache",
+        "      uses: actions/cache@v4",
+        "      with:",
+        f"        path: {IMAGE_TARBALL}",
+        f"        key: faasr-image-{container_image}",
+        "    - name: Load image",
+        "      run: |",
+        f"        if [ -f {IMAGE_TARBALL} ]; then docker load -i {IMAGE_TARBALL}; fi",
+        f"        docker image inspect {container_image} > /dev/null 2>&1 || docker pull {container_image}",
+        f"        if [ ! -f {IMAGE_TARBALL} ]; then docker save -o {IMAGE_TARBALL} {container_image}; fi",
+    ]
+
+
+def build_github_workflow_content(workflow_name, prefixed_action_name, container_image, locator_var=None,
+                                  runner_config=None, ranked=False):
+    """
+    Returns the GitHub Actions workflow YAML that runs one FaaSr action. When
+    locator_var is given, the job reads the published payload locator from that
+    repository variable, so re-registering does not rewrite the workflow file.
+
+    Arguments:
+        workflow_name: WorkflowName, recorded in the generated marker line
+        prefixed_action_name: {WorkflowName}-{action} workflow name
+        container_image: image the action runs in
+        locator_var: repository variable holding the payload locator, or None
+        runner_config: settings from get_runner_config (defaults when None)
+        ranked: whether the action runs as several ranked instances per invocation
+    """
+    runner_config = runner_config or DEFAULT_RUNNER_CONFIG
+    env_names = ACTION_ENV + (['PAYLOAD_LOCATOR'] if locator_var else [])
+
+    lines = [
+        GENERATED_MARKER.format(workflow_name),
+        f"name: {prefixed_action_name}",
+        "",
+        "on:",
+        "  workflow_dispatch:",
+        "    inputs:",
+        "      OVERWRITTEN:",
+        "        description: 'overwritten fields'",
+        "        required: true",
+        "      PAYLOAD_URL:",
+        "        description: 'url to payload'",
+        "        required: true",
+    ]
+    if runner_config['Concurrency']:
+        lines += [
+            "concurrency:",
+            f"  group: {RANKED_CONCURRENCY_GROUP if ranked else CONCURRENCY_GROUP}",
+            "  cancel-in-progress: false",
+        ]
+    lines += ["jobs:", GENERATED_JOB]
+    lines += _job_header(runner_config)
+
+    if runner_config['ImageCache'] == 'none':
+        lines.append(f"    container: {container_image}")
+    lines.append("    env:")
+    lines += _env_block(locator_var)
+    lines.append("    steps:")
+
+    if runner_config['ImageCache'] == 'none':
+        lines += [
+            "    - name: run Python",
+            "      run: |",
+            "        cd /action",
+            "        python3 faasr_entry.py",
+        ]
+    else:
+        # The image runs as a step so it can be pulled or loaded from a cache first
+        env_args = " ".join(f"-e {name}" for name in env_names)
+        lines += _image_steps(container_image, runner_config['ImageCache'])
+        lines += [
+            "    - name: run Python",
+            "      run: |",
+            f"        docker run --rm {env_args} -w /action --entrypoint python3 {container_image} faasr_entry.py",
+        ]
+    return "\n".join(lines) + "\n"
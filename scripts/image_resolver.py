@@ -0,0 +1,255 @@
+"""
+Container image digest resolution for FaaSr actions.
+
+Every deployer used to resolve ActionContainers with its own defaults, and a
+floating tag such as ``:latest`` gave no way of telling whether the code behind
+it changed. This module collects the images of all actions once, resolves each
+distinct tag to a digest concurrently and caches the answers on disk with a
+TTL, so deployers can pin ``name@sha256:...`` and skip re-deploys when the
+digest has not moved.
+
+Tags are resolved through the registry HTTP API v2 (Docker Hub, ghcr.io or a
+local ``localhost:5000`` registry) and through ECR DescribeImages for Amazon ECR.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import requests
+
+from cloud_retry import call_with_retry
+
+DEFAULT_CONTAINERS = {
+    'githubactions': 'ghcr.io/faasr/github-actions-tidyverse',
+    'lambda': '145342739029.dkr.ecr.us-east-1.amazonaws.com/aws-lambda-tidyverse:latest',
+    'openwhisk': 'ghcr.io/faasr/openwhisk-tidyverse',
+}
+
+MANIFEST_ACCEPT = ", ".join([
+    "application/vnd.oci.image.index.v1+json",
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+    "application/vnd.docker.distribution.manifest.v2+json",
+    "application/vnd.oci.image.manifest.v1+json",
+])
+
+DOCKER_HUB_REGISTRY = 'registry-1.docker.io'
+DIGEST_CACHE_TTL = 600
+RESOLVE_MAX_WORKERS = 8
+REGISTRY_TIMEOUT = 10
+
+ECR_PATTERN = re.compile(r'^(\d{12})\.dkr\.ecr\.([a-z0-9-]+)\.amazonaws\.com$')
+
+
+def get_action_image(workflow_data, action_name, platform):
+    """
+    Returns the image an action is deployed with: its digest-pinned reference if
+    one was resolved, else ActionContainers, else the platform default
+
+    Arguments:
+        workflow_data: FaaSr payload dict
+        action_name: action in ActionList
+        platform: 'githubactions', 'lambda' or 'openwhisk'
+    """
+    resolved = workflow_data.get('_resolved_images', {})
+    if action_name in resolved:
+        return resolved[action_name]
+    return workflow_data.get('ActionContainers', {}).get(action_name) or DEFAULT_CONTAINERS[platform]
+
+
+def parse_image_reference(image):
+    """
+    Splits an image reference into (registry, repository, tag, digest).
+    Docker Hub shorthands are expanded (e.g. "ubuntu" -> library/ubuntu).
+    """
+    digest = None
+    if '@' in image:
+        image, digest = image.split('@', 1)
+
+    tag = None
+    last = image.rsplit('/', 1)[-1]
+    if ':' in last:
+        image, tag = image.rsplit(':', 1)
+
+    parts = image.split('/', 1)
+    if len(parts) == 2 and ('.' in parts[0] or ':' in parts[0] or parts[0] == 'localhost'):
+        registry, repository = parts
+    else:
+        registry, repository = DOCKER_HUB_REGISTRY, image
+    if registry in ('docker.io', 'index.docker.io'):
+        registry = DOCKER_HUB_REGISTRY
+    if registry == DOCKER_HUB_REGISTRY and '/' not in repository:
+        repository = f"library/{repository}"
+
+    if tag is None and digest is None:
+        tag = 'latest'
+    return registry, repository, tag, digest
+
+
+def pin_image(image, digest):
+    """Returns the image reference pinned to digest (name@sha256:...)"""
+    name = image.split('@', 1)[0]
+    last = name.rsplit('/', 1)[-1]
+    if ':' in last:
+        name = name.rsplit(':', 1)[0]
+    return f"{name}@{digest}"
+
+
+def image_digest(image):
+    """Returns the digest of a pinned image reference, or None"""
+    return image.split('@', 1)[1] if '@' in image else None
+
+
+def _registry_url(registry):
+    # Local test registries normally serve plain HTTP
+    if registry.startswith(('localhost', '127.0.0.1')):
+        return f"http://{registry}"
+    return f"https://{registry}"
+
+
+def _bearer_token(challenge, timeout):
+    """Fetch an anonymous (or GITHUB_TOKEN-backed for ghcr.io) token for a Bearer challenge"""
+    params = dict(re.findall(r'(\w+)="([^"]*)"', challenge))
+    realm = params.pop('realm')
+    auth = None
+    if 'ghcr.io' in realm and os.getenv('GITHUB_TOKEN'):
+        auth = ('token', os.getenv('GITHUB_TOKEN'))
+    r = requests.get(realm, params=params, auth=auth, timeout=timeout)
+    r.raise_for_status()
+    body = r.json()
+    return body.get('token') or body.get('access_token')
+
+
+def resolve_registry_digest(registry, repository, tag, timeout=REGISTRY_TIMEOUT):
+    """Resolve a tag to a digest through the registry HTTP API v2"""
+    url = f"{_registry_url(registry)}/v2/{repository}/manifests/{tag}"
+    headers = {'Accept': MANIFEST_ACCEPT}
+    r = requests.head(url, headers=headers, timeout=timeout)
+    if r.status_code == 401 and r.headers.get('WWW-Authenticate', '').startswith('Bearer'):
+        headers['Authorization'] = f"Bearer {_bearer_token(r.headers['WWW-Authenticate'], timeout)}"
+        r = requests.head(url, headers=headers, timeout=timeout)
+    r.raise_for_status()
+
+    digest = r.headers.get('Docker-Content-Digest')
+    if not digest:
+        # Some registries only send the digest header on GET
+        r = requests.get(url, headers=headers, timeout=timeout)
+        r.raise_for_status()
+        digest = r.headers.get('Docker-Content-Digest')
+    if not digest:
+        raise ValueError(f"registry {registry} did not return a digest for {repository}:{tag}")
+    return digest
+
+
+def resolve_ecr_digest(registry, repository, tag):
+    """Resolve a tag to a digest through ECR DescribeImages"""
+    registry_id, region = ECR_PATTERN.match(registry).groups()
+    ecr = boto3.client(
+        'ecr',
+        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+        region_name=region
+    )
+    response = ecr.describe_images(
+        registryId=registry_id,
+        repositoryName=repository,
+        imageIds=[{'imageTag': tag}]
+    )
+    return response['imageDetails'][0]['imageDigest']
+
+
+def resolve_digest(image):
+    """Resolve one image reference to its digest"""
+    registry, repository, tag, digest = parse_image_reference(image)
+    if digest:
+        return digest
+    if ECR_PATTERN.match(registry):
+        return resolve_ecr_digest(registry, repository, tag)
+    return resolve_registry_digest(registry, repository, tag)
+
+
+class DigestCache:
+    """
+    Tag-to-digest cache shared by every action in a run and persisted between
+    runs as JSON. Entries older than ttl seconds are resolved again.
+    """
+
+    def __init__(self, path=None, ttl=DIGEST_CACHE_TTL):
+        self.path = path or os.path.join(
+            os.getenv('FAASR_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'faasr')),
+            'image-digests.json'
+        )
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, 'r') as f:
+                self._entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._entries = {}
+
+    def get(self, image):
+        with self._lock:
+            entry = self._entries.get(image)
+        if entry and time.time() - entry['resolved_at'] < self.ttl:
+            return entry['digest']
+        return None
+
+    def set(self, image, digest):
+        with self._lock:
+            self._entries[image] = {'digest': digest, 'resolved_at': time.time()}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock:
+            with open(self.path, 'w') as f:
+                json.dump(self._entries, f, indent=2, sort_keys=True)
+
+
+def resolve_workflow_images(workflow_data, platform_of, cache=None):
+    """
+    Resolve the images of every action to digest-pinned references. Each distinct
+    image is resolved once, concurrently. Images that cannot be resolved (e.g. a
+    private registry without credentials) keep their tag and are reported.
+
+    Arguments:
+        workflow_data: FaaSr payload dict
+        platform_of: function returning the platform of an action name
+        cache: DigestCache, created with the default path when None
+    Returns:
+        dict: {action_name: pinned image reference}
+    """
+    cache = cache or DigestCache()
+    images = {}
+    for action_name in workflow_data['ActionList']:
+        platform = platform_of(action_name)
+        if platform is None:
+            continue
+        image = workflow_data.get('ActionContainers', {}).get(action_name) or DEFAULT_CONTAINERS[platform]
+        images.setdefault(image, []).append(action_name)
+
+    def resolve(image):
+        digest = cache.get(image)
+        if digest is None:
+            digest = call_with_retry('registry', resolve_digest, image)
+            cache.set(image, digest)
+        return digest
+
+    resolved = {}
+    with ThreadPoolExecutor(max_workers=RESOLVE_MAX_WORKERS) as executor:
+        futures = {image: executor.submit(resolve, image) for image in images}
+        for image, future in futures.items():
+            try:
+                digest = future.result()
+            except Exception as e:
+                print(f"Warning: could not resolve a digest for {image}, deploying by tag: {e}")
+                continue
+            print(f"Resolved {image} -> {digest}")
+            for action_name in images[image]:
+                resolved[action_name] = pin_image(image, digest)
+
+    cache.save()
+    return resolved
@@ -4,6 +4,7 @@ import argparse
 import json
 import os
 import sys
+import time
 from pathlib import Path
 
 # Add the FaaSr-Backend to the Python path
@@ -12,6 +13,12 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'FaaSr-Backend'
 from FaaSr_py.engine.scheduler import Scheduler
 from FaaSr_py.engine.faasr_payload import FaaSrPayload
 
+from cloud_retry import retry_stats
+from credentials import resolve_placeholders, substitute_credentials
+from payload_store import payload_version, published_locator
+from run_history import HistoryStore
+from run_tracker import RunTracker
+
 
 class WorkflowMigrationAdapter:
     """
@@ -42,17 +49,6 @@ class WorkflowMigrationAdapter:
             print(f"Error: Invalid JSON in workflow file {self.workflow_file_path}")
             sys.exit(1)
     
-    def _get_credentials(self):
-        """Get credentials from environment variables."""
-        return {
-            "My_GitHub_Account_TOKEN": os.getenv('GITHUB_TOKEN'),
-            "My_Minio_Bucket_ACCESS_KEY": os.getenv('MINIO_ACCESS_KEY'),
-            "My_Minio_Bucket_SECRET_KEY": os.getenv('MINIO_SECRET_KEY'),
-            "My_OW_Account_API_KEY": os.getenv('OW_API_KEY', ''),
-            "My_Lambda_Account_ACCESS_KEY": os.getenv('AWS_ACCESS_KEY_ID', ''),
-            "My_Lambda_Account_SECRET_KEY": os.getenv('AWS_SECRET_ACCESS_KEY', ''),
-        }
-    
     def _replace_credential_placeholders(self, workflow_data):
         """
         Replace credential placeholders in the workflow data with actual values.
@@ -61,38 +57,9 @@ class WorkflowMigrationAdapter:
             workflow_data (dict): The workflow configuration
             
         Returns:
-            dict: Updated workflow data with credentials
+            dict: A copy of the workflow data with credentials
         """
-        credentials = self._get_credentials()
-        workflow_copy = workflow_data.copy()
-        
-        # Replace placeholder values in ComputeServers with actual credentials
-        if 'ComputeServers' in workflow_copy:
-            for server_key, server_config in workflow_copy['ComputeServers'].items():
-                faas_type = server_config.get('FaaSType', '').lower()
-                
-                if faas_type in ['lambda', 'aws_lambda', 'aws']:
-                    if credentials['My_Lambda_Account_ACCESS_KEY']:
-                        server_config['AccessKey'] = credentials['My_Lambda_Account_ACCESS_KEY']
-                    if credentials['My_Lambda_Account_SECRET_KEY']:
-                        server_config['SecretKey'] = credentials['My_Lambda_Account_SECRET_KEY']
-                elif faas_type in ['githubactions', 'github_actions', 'github']:
-                    if credentials['My_GitHub_Account_TOKEN']:
-                        server_config['Token'] = credentials['My_GitHub_Account_TOKEN']
-                elif faas_type in ['openwhisk', 'open_whisk', 'ow']:
-                    if credentials['My_OW_Account_API_KEY']:
-                        server_config['API.key'] = credentials['My_OW_Account_API_KEY']
-        
-        # Replace placeholder values in DataStores with actual credentials
-        if 'DataStores' in workflow_copy:
-            for store_key, store_config in workflow_copy['DataStores'].items():
-                if store_key == 'My_Minio_Bucket':
-                    if credentials['My_Minio_Bucket_ACCESS_KEY']:
-                        store_config['AccessKey'] = credentials['My_Minio_Bucket_ACCESS_KEY']
-                    if credentials['My_Minio_Bucket_SECRET_KEY']:
-                        store_config['SecretKey'] = credentials['My_Minio_Bucket_SECRET_KEY']
-        
-        return workflow_copy
+        return substitute_credentials(workflow_data, resolve_placeholders(workflow_data))
     
     def _create_github_hosted_workflow(self):
         """
@@ -138,6 +105,12 @@ class WorkflowMigrationAdapter:
         
         # Create overwritten fields to pass the processed workflow
         overwritten_fields = processed_workflow.copy()
+
+        # Point functions at the payload published by register_workflow.py so
+        # they can fetch it with a single DataStore GET, if it was published
+        locator = published_locator(self.workflow_data)
+        if locator:
+            overwritten_fields['PayloadLocator'] = locator
         
         # Create a temporary local payload that mimics the GitHub structure
         # We'll monkey-patch the FaaSrPayload to work with our local data
@@ -154,6 +127,9 @@ class WorkflowMigrationAdapter:
     def trigger_workflow(self):
         """
         Trigger the workflow using the Scheduler class.
+
+        Returns:
+            float: trigger time (epoch seconds)
         """
         # Get the function to invoke
         function_invoke = self.workflow_data.get('FunctionInvoke')
@@ -190,11 +166,45 @@ class WorkflowMigrationAdapter:
         # This replaces all the individual trigger_* methods from invoke_workflow.py
         try:
             print(f"✓ Using Scheduler to trigger function: {function_invoke}")
+            trigger_time = time.time()
             scheduler.trigger_func(workflow_name, function_invoke)
             print("✓ Workflow triggered successfully using Scheduler!")
         except Exception as e:
             print(f"✗ Error triggering workflow with Scheduler: {e}")
             sys.exit(1)
+        return trigger_time
+
+    def wait_for_completion(self, trigger_time, timeout, settle_seconds):
+        """
+        Follow the run across platforms until it finishes and print its timeline.
+
+        Returns:
+            RunTracker: the tracker holding the observed run
+        """
+        print(f"\nWaiting for the workflow to finish (timeout {timeout}s)...")
+        tracker = RunTracker(self.workflow_data, trigger_time)
+        if tracker.wait(timeout, settle_seconds):
+            print("✓ All actions finished")
+        tracker.print_report()
+        return tracker
+
+    def record_history(self, trigger_time, tracker=None, history_db=None):
+        """Append this invocation, and its timeline when it was followed, to the history database"""
+        if tracker is None:
+            status, timeline = 'triggered', []
+        else:
+            status, timeline = ('ok' if tracker.finished() else 'incomplete'), tracker.timeline()
+        try:
+            store = HistoryStore(history_db)
+            try:
+                store.record_run('invoke', self.workflow_data.get('WorkflowName', 'default'),
+                                 payload_version(self.workflow_data), trigger_time, status,
+                                 retry_stats(), timeline)
+            finally:
+                store.close()
+            print(f"Recorded invocation in {store.path}")
+        except Exception as e:
+            print(f"Warning: could not record the invocation history: {e}")
 
 
 class FaaSrPayloadAdapter(FaaSrPayload):
@@ -233,6 +243,16 @@ def parse_arguments():
                       help='Path to the workflow JSON file')
     parser.add_argument('--dry-run', action='store_true',
                       help='Show what would be done without actually triggering')
+    parser.add_argument('--wait', action='store_true',
+                      help='Follow the run until it finishes and report per-action latencies')
+    parser.add_argument('--wait-timeout', type=int, default=1800,
+                      help='Seconds to wait for the run to finish')
+    parser.add_argument('--settle-seconds', type=int, default=120,
+                      help='Stop waiting once nothing has run or changed for this many seconds')
+    parser.add_argument('--history-db', default=None,
+                      help='SQLite history database (default: $FAASR_HISTORY_DB or ~/.cache/faasr/history.db)')
+    parser.add_argument('--no-history', action='store_true',
+                      help='Do not record this invocation in the history database')
     return parser.parse_args()
 
 
@@ -265,7 +285,12 @@ def main():
     
     # Trigger the workflow using the new Scheduler approach
     try:
-        adapter.trigger_workflow()
+        trigger_time = adapter.trigger_workflow()
+        tracker = None
+        if args.wait:
+            tracker = adapter.wait_for_completion(trigger_time, args.wait_timeout, args.settle_seconds)
+        if not args.no_history:
+            adapter.record_history(trigger_time, tracker, args.history_db)
         print("\n" + "=" * 60)
         print("Migration completed successfully!")
         print("The workflow has been triggered using the Scheduler class.")
@@ -0,0 +1,78 @@
+"""
+Canonical serialization and size budgets for the payloads handed to functions.
+
+Every payload is written as canonical JSON: keys sorted, no whitespace, UTF-8
+without escaping. The same workflow therefore always gives the same bytes,
+so its hash can identify the version and two versions can be compared by
+their bytes. The json module defines those bytes. orjson writes floats
+differently (1e-7 for 1e-07, 1e16 for 1e+16, null for NaN) and rejects ints
+beyond 64 bits, so it is only used, when installed, for payloads without
+floats or such ints; for those its output is identical. The hash of a payload
+therefore does not depend on whether orjson is installed.
+
+SECRET_PAYLOAD has to fit where each platform keeps it:
+
+    lambda        -- all environment variables of a function together, 4 KB
+    githubactions -- one repository secret, 48 KB
+
+OpenWhisk actions only get the payload locator as a parameter, so they have no
+budget here.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PAYLOAD_BUDGETS = {
+    'lambda': 4 * 1024,
+    'githubactions': 48 * 1024,
+}
+BUDGET_WARN_RATIO = 0.8
+
+
+def _orjson_matches(obj):
+    """True if orjson writes obj byte for byte like the json module: no floats, no ints beyond 64 bits"""
+    pending = [obj]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, dict):
+            pending.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            pending.extend(value)
+        elif isinstance(value, float):
+            return False
+        elif isinstance(value, int) and not -2 ** 63 <= value < 2 ** 64:
+            return False
+    return True
+
+
+def canonical_json(obj):
+    """Returns the canonical JSON bytes of obj"""
+    if orjson is not None and _orjson_matches(obj):
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            # e.g. non-string keys, which json converts and orjson rejects
+            pass
+    return json.dumps(obj, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def section_sizes(payload):
+    """
+    Returns how many bytes of the serialized payload each top-level key takes
+    (its key, value, separators), largest first
+    """
+    sizes = {key: len(canonical_json({key: value})) - 1 for key, value in payload.items()}
+    return dict(sorted(sizes.items(), key=lambda item: item[1], reverse=True))
+
+
+def format_section_report(payload, total=None):
+    """One line per top-level section of the payload with its size and share"""
+    sizes = section_sizes(payload)
+    total = total or len(canonical_json(payload))
+    return "\n".join(
+        f"  {key:<30} {size:>8} bytes {100 * size / total:>5.1f}%" for key, size in sizes.items()
+    )
@@ -0,0 +1,150 @@
+"""
+Pre-compiled workflow payloads published to the workflow's S3/MinIO DataStore.
+
+Registration validates the workflow once, adds its graph (adjacency, ranks and
+predecessors of every action) and stores the result under a content hash, so a
+function can fetch everything it needs with a single object GET instead of
+downloading and re-parsing the workflow JSON from GitHub.
+
+The published payload keeps credential placeholders as they are in the workflow
+file; actual credentials only ever travel in SECRET_PAYLOAD.
+"""
+
+import hashlib
+
+import boto3
+
+from cloud_retry import call_with_retry, is_not_found
+from credentials import get_datastore_credentials
+from payload_builder import canonical_json
+from platform_config import DEFAULT_AWS_REGION
+from workflow_graph import build_adjacency_graph, predecessors_list, ranked_predecessors
+
+PAYLOAD_PREFIX = "FaaSrPayload"
+
+
+def get_payload_datastore(workflow_data):
+    """Returns (name, config) of the DataStore payloads are published to"""
+    store_name = workflow_data.get('DefaultDataStore') or next(iter(workflow_data.get('DataStores', {})), None)
+    if not store_name or store_name not in workflow_data.get('DataStores', {}):
+        return None, None
+    return store_name, workflow_data['DataStores'][store_name]
+
+
+def get_s3_client(store_name, store_config, config=None):
+    """Returns an S3 client for a DataStore, with its credentials resolved by get_datastore_credentials"""
+    access_key, secret_key = get_datastore_credentials(store_name, store_config)
+    return boto3.client(
+        's3',
+        aws_access_key_id=access_key,
+        aws_secret_access_key=secret_key,
+        region_name=store_config.get('Region') or DEFAULT_AWS_REGION,
+        endpoint_url=store_config.get('Endpoint') or None,
+        config=config
+    )
+
+
+def compile_payload(workflow_data):
+    """
+    Returns the workflow with its pre-computed graph under "_compiled".
+    Keys starting with "_" (e.g. _workflow_file) are local bookkeeping and are dropped.
+    The workflow is expected to have passed check_dag already.
+    """
+    workflow = {k: v for k, v in workflow_data.items() if not k.startswith('_')}
+    adj_graph, ranks = build_adjacency_graph(workflow)
+    pre = predecessors_list(adj_graph)
+    workflow['_compiled'] = {
+        'Successors': {func: list(adj_graph[func]) for func in workflow['ActionList']},
+        'Ranks': {func: ranks.get(func, 0) for func in workflow['ActionList']},
+        'Predecessors': {func: ranked_predecessors(pre, ranks, func) for func in workflow['ActionList']},
+    }
+    return workflow
+
+
+def serialize_payload(compiled):
+    """Returns the canonical JSON bytes of a compiled payload"""
+    return canonical_json(compiled)
+
+
+def payload_version(workflow_data):
+    """Returns the short content hash of the compiled payload, which identifies a workflow version"""
+    return hashlib.sha256(serialize_payload(compile_payload(workflow_data))).hexdigest()[:12]
+
+
+def payload_locator(workflow_data, body=None):
+    """
+    Returns the locator of a workflow's compiled payload without uploading it:
+    {"DataStore": name, "Bucket": bucket, "Key": key, "Hash": sha256}
+    or None if the workflow has no DataStore
+    """
+    store_name, store_config = get_payload_datastore(workflow_data)
+    if store_config is None:
+        return None
+    if body is None:
+        body = serialize_payload(compile_payload(workflow_data))
+    digest = hashlib.sha256(body).hexdigest()
+    workflow_name = workflow_data.get('WorkflowName', 'default')
+    return {
+        'DataStore': store_name,
+        'Bucket': store_config['Bucket'],
+        'Key': f"{PAYLOAD_PREFIX}/{workflow_name}/{digest}.json",
+        'Hash': digest,
+    }
+
+
+def locator_to_str(locator):
+    """Returns the string form of a locator: {DataStore}/{Key}"""
+    return f"{locator['DataStore']}/{locator['Key']}"
+
+
+def payload_exists(workflow_data, locator):
+    """True if the payload at locator has been published (one HEAD request)"""
+    s3 = get_s3_client(locator['DataStore'], workflow_data['DataStores'][locator['DataStore']])
+    try:
+        call_with_retry('s3', s3.head_object, Bucket=locator['Bucket'], Key=locator['Key'])
+    except Exception as e:
+        if not is_not_found(e):
+            raise
+        return False
+    return True
+
+
+def publish_payload(workflow_data):
+    """
+    Upload the compiled payload to the workflow's DataStore. The key is the
+    content hash, so an unchanged workflow is not uploaded again.
+
+    Returns:
+        locator dict (see payload_locator) or None if the workflow has no DataStore
+    """
+    body = serialize_payload(compile_payload(workflow_data))
+    locator = payload_locator(workflow_data, body)
+    if locator is None:
+        return None
+
+    if payload_exists(workflow_data, locator):
+        print(f"Payload {locator['Hash'][:12]} already published, skipping upload")
+        return locator
+    s3 = get_s3_client(*get_payload_datastore(workflow_data))
+    call_with_retry('s3', s3.put_object, Bucket=locator['Bucket'], Key=locator['Key'], Body=body,
+                    ContentType='application/json')
+    print(f"Published payload {locator['Hash'][:12]} ({len(body)} bytes) to {locator_to_str(locator)}")
+    return locator
+
+
+def published_locator(workflow_data):
+    """
+    Returns the locator of the workflow's payload if registration published it,
+    or None if it was not published (e.g. --skip-payload-publish) or the
+    DataStore cannot be reached
+    """
+    locator = payload_locator(workflow_data)
+    if locator is None:
+        return None
+    try:
+        if payload_exists(workflow_data, locator):
+            return locator
+        print(f"Payload {locator['Hash'][:12]} is not published; functions will read the workflow from GitHub")
+    except Exception as e:
+        print(f"Warning: could not check the published payload: {e}")
+    return None
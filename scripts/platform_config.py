@@ -0,0 +1,64 @@
+"""
+Platform and credential lookups shared by the FaaSr CLI scripts: which
+platform an action runs on, Lambda regions and OpenWhisk endpoints/keys
+"""
+
+import os
+
+from credentials import get_credential_provider
+
+DEFAULT_AWS_REGION = 'us-east-1'
+
+def get_lambda_region(server_config):
+    """Returns the region of a Lambda ComputeServer, falling back to AWS_DEFAULT_REGION"""
+    return server_config.get('Region') or os.getenv('AWS_DEFAULT_REGION') or DEFAULT_AWS_REGION
+
+def get_openwhisk_credentials(server_name, server_config):
+    """
+    Returns (api_host, namespace, ssl, api_key) of one OpenWhisk ComputeServer.
+    The API key is resolved as {ServerName}_API_KEY (see credentials.py), then
+    taken from the server's API.key when it is not a placeholder, then resolved
+    as OW_API_KEY.
+    """
+    provider = get_credential_provider()
+    api_key = provider.get(f"{server_name}_API_KEY")
+    if not api_key and server_config.get('API.key') not in (None, '', f"{server_name}_API_KEY"):
+        api_key = server_config['API.key']
+    if not api_key:
+        api_key = provider.get('OW_API_KEY')
+    return (
+        server_config['Endpoint'],
+        server_config.get('Namespace', '_'),
+        str(server_config.get('SSL', 'true')).lower() == 'true',
+        api_key
+    )
+
+def get_ow_api_url(api_host):
+    """Returns the OpenWhisk API host as a URL"""
+    if not api_host.startswith('http'):
+        api_host = f"https://{api_host}"
+    return api_host.rstrip('/')
+
+def get_ow_auth(ow_api_key):
+    """Returns an OpenWhisk API key as a (username, password) tuple for the REST API"""
+    if ow_api_key and ':' in ow_api_key:
+        return tuple(ow_api_key.split(':', 1))
+    return None
+
+def get_action_platform(workflow_data, action_name):
+    """Returns the normalised FaaS platform ('lambda', 'githubactions', 'openwhisk') of an action, or None"""
+    server_name = workflow_data['ActionList'][action_name]['FaaSServer']
+    faas_type = workflow_data['ComputeServers'][server_name]['FaaSType'].lower()
+    if faas_type in ['lambda', 'aws_lambda', 'aws']:
+        return 'lambda'
+    elif faas_type in ['githubactions', 'github_actions', 'github']:
+        return 'githubactions'
+    elif faas_type in ['openwhisk', 'open_whisk', 'ow']:
+        return 'openwhisk'
+    return None
+
+def get_workflow_faas_types(workflow_data):
+    """Returns the normalised FaaS platforms used by actions"""
+    platforms = {get_action_platform(workflow_data, action_name) for action_name in workflow_data['ActionList']}
+    platforms.discard(None)
+    return platforms
@@ -5,27 +5,97 @@ import json
 import os
 import sys
 import boto3
+from botocore.config import Config
 from github import Github
 import base64
+import hashlib
 import tempfile
 import shutil
-import subprocess
+import shlex
 import requests
 import time
 import logging
 from collections import defaultdict
+from contextlib import contextmanager
+from workflow_graph import check_dag, ranked_actions, unconditional_actions
+from payload_store import (compile_payload, get_payload_datastore, get_s3_client, locator_to_str, payload_version,
+                           publish_payload, serialize_payload)
+from platform_config import (get_action_platform, get_lambda_region, get_openwhisk_credentials,
+                             get_ow_api_url, get_ow_auth, get_workflow_faas_types)
+from credentials import get_credential_provider, get_datastore_credentials, resolve_placeholders, substitute_credentials
+from cloud_retry import call_with_retry, is_not_found, is_precondition_failed, reset_retry_stats, retry_stats, retry_summary, run_command
+from run_history import HistoryStore, record_payload_size, reset_records, track_deploy
+from github_workflow_template import build_github_workflow_content, get_runner_config, is_generated_workflow
+from payload_builder import BUDGET_WARN_RATIO, PAYLOAD_BUDGETS, canonical_json, format_section_report
+from registration_lease import LEASE_TTL, LEASE_WAIT, LeaseTimeout, RegistrationLease
+from image_resolver import DIGEST_CACHE_TTL, DigestCache, get_action_image, image_digest, resolve_workflow_images
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+import threading
 import re
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
 
+LAMBDA_MAX_POOL_CONNECTIONS = 20
+RECONCILE_MAX_WORKERS = 8
+OW_LIST_PAGE_SIZE = 200
+PREFLIGHT_TIME_BUDGET = 15
+WATCH_INTERVAL = 0.5
+GITHUB_STALE_SHA_RETRIES = 2
+# Lambda tag and OpenWhisk annotation naming the workflow that created a function.
+# Reconcile only deletes functions that carry it with their own WorkflowName.
+OWNER_TAG = 'FaaSrWorkflow'
+
+# Registration lease held by this run, checked before each deploy step
+_lease = None
+
+# One Lambda client per (access key, region), shared by every action in that region
+_lambda_clients = {}
+_lambda_clients_lock = threading.Lock()
+
 def parse_arguments():
     parser = argparse.ArgumentParser(description='Deploy FaaSr functions to specified platform')
     parser.add_argument('--workflow-file', required=True,
                       help='Path to the workflow JSON file')
+    parser.add_argument('--reconcile', action='store_true',
+                      help='List deployed functions under the {WorkflowName}- prefix once per platform, '
+                           'then create, update and delete to match the workflow file')
+    parser.add_argument('--skip-preflight', action='store_true',
+                      help='Do not check credentials and connectivity before deploying')
+    parser.add_argument('--preflight-timeout', type=float, default=PREFLIGHT_TIME_BUDGET,
+                      help='Seconds allowed for all preflight checks together')
+    parser.add_argument('--skip-payload-publish', action='store_true',
+                      help='Do not publish the compiled payload to the DataStore')
+    parser.add_argument('--no-pin-digests', action='store_true',
+                      help='Deploy images by tag instead of resolving them to digests')
+    parser.add_argument('--digest-cache-ttl', type=int, default=DIGEST_CACHE_TTL,
+                      help='Seconds a resolved image digest is reused before resolving it again')
+    parser.add_argument('--history-db', default=None,
+                      help='SQLite history database (default: $FAASR_HISTORY_DB or ~/.cache/faasr/history.db)')
+    parser.add_argument('--no-history', action='store_true',
+                      help='Do not record this registration in the history database')
+    parser.add_argument('--watch', action='store_true',
+                      help='After deploying, keep watching the workflow file and redeploy only what changed on each save')
+    parser.add_argument('--watch-interval', type=float, default=WATCH_INTERVAL,
+                      help='Seconds between checks of the workflow file in --watch mode')
+    parser.add_argument('--lazy', action='store_true',
+                      help='Deploy the unconditional path from FunctionInvoke first and the actions only '
+                           'reached through a conditional branch once the workflow is runnable')
+    parser.add_argument('--no-lease', action='store_true',
+                      help='Do not take the per-workflow registration lease in the DataStore')
+    parser.add_argument('--lease-ttl', type=float, default=LEASE_TTL,
+                      help='Seconds the registration lease stays valid without being renewed')
+    parser.add_argument('--lease-wait', type=float, default=LEASE_WAIT,
+                      help='Seconds to wait for another registration of the same workflow to finish')
     return parser.parse_args()
 
+def check_lease():
+    """Stop deploying if another runner has taken over the registration lease"""
+    if _lease is not None and _lease.lost:
+        print("Error: the registration lease was taken over by another runner; stopping this deploy")
+        sys.exit(1)
+
 def read_workflow_file(file_path):
     try:
         with open(file_path, 'r') as f:
@@ -37,177 +107,6 @@ def read_workflow_file(file_path):
         print(f"Error: Invalid JSON in workflow file {file_path}")
         sys.exit(1)
 
-def extract_rank(str_input):
-    """
-    Returns action name and rank of an action with rank (e.g func(7) returns (func, 7))
-
-    Arguments:
-        str_input: function name with rank
-    Returns:
-        (str, int) -- action name and rank
-    """
-    parts = str_input.split("(")
-    if len(parts) != 2 or not parts[1].endswith(")"):
-        return str_input, 1
-    rank = int(parts[1][:-1])
-    action_name = parts[0]
-    return (action_name, rank)
-
-def is_cyclic(adj_graph, curr, visited, stack):
-    """
-    Recursive function that if there is a cycle in a directed
-    graph defined by an adjacency list
-
-    Arguments:
-        adj_graph: adjacency list for graph (dict)
-        curr: current node
-        visited: set of visited nodes (set)
-        stack: list of nodes in recursion call stack (list)
-
-    Returns:
-        bool: True if cycle exists, False otherwise
-    """
-    # if the current node is in the recursion call
-    # stack then there must be a cycle in the graph
-    if curr in stack:
-        return True
-
-    # add current node to recursion call stack and visited set
-    visited.add(curr)
-    stack.append(curr)
-
-    # check each successor for cycles, recursively calling is_cyclic()
-    for child in adj_graph[curr]:
-        if child not in visited and is_cyclic(adj_graph, child, visited, stack):
-            logger.error(f"Function loop found from node {curr} to {child}")
-            sys.exit(1)
-        elif child in stack:
-            logger.error(f"Function loop found from node {curr} to {child}")
-            sys.exit(1)
-
-    # no more successors to visit for this branch and no cycles found
-    # remove current node from recursion call stack
-    stack.pop()
-    return False
-
-def build_adjacency_graph(payload):
-    """
-    This function builds an adjacency list for the FaaSr workflow graph and determines
-    the ranks of each action
-
-    Arguments:
-        payload: FaaSr payload dict
-    Returns:
-        adj_graph: dict of predecessor: successor pairs
-        rank: dict of each action's rank
-    """
-    adj_graph = defaultdict(list)
-    ranks = dict()
-
-    # Build adjacency list from ActionList
-    for func in payload["ActionList"].keys():
-        invoke_next = payload["ActionList"][func]["InvokeNext"]
-        if isinstance(invoke_next, str):
-            invoke_next = [invoke_next]
-        for child in invoke_next:
-
-            def process_action(action):
-                action_name, action_rank = extract_rank(action)
-                if action_name in ranks and ranks[action_name] > 1:
-                    err_msg = "Function with rank cannot have multiple predecessors"
-                    logger.error(err_msg)
-                    sys.exit(1)
-                else:
-                    adj_graph[func].append(action_name)
-                    ranks[action_name] = action_rank
-
-            if isinstance(child, dict):
-                for conditional_branch in child.values():
-                    for action in conditional_branch:
-                        process_action(action)
-            else:
-                process_action(child)
-
-    for func in adj_graph:
-        if func not in ranks:
-            ranks[func] = 0
-
-    return (adj_graph, ranks)
-
-def predecessors_list(adj_graph):
-    """This function returns a map of action predecessor pairs
-
-    Arguments:
-        adj_graph: adjacency list for graph -- dict(function: successor)
-    """
-    pre = defaultdict(list)
-    for func1 in adj_graph:
-        for func2 in adj_graph[func1]:
-            pre[func2].append(func1)
-    return pre
-
-def check_dag(faasr_payload):
-    """
-    This method checks for cycles, repeated function names,
-    or unreachable nodes in the workflow and aborts if it finds any
-
-    Arguments:
-        payload: FaaSr payload dict
-    Returns:
-        predecessors: dict -- map of function predecessors
-    """
-    if faasr_payload["FunctionInvoke"] not in faasr_payload["ActionList"]:
-        err_msg = "FunctionInvoke does not refer to a valid function"
-        logger.error(err_msg)
-        sys.exit(1)
-
-    adj_graph, ranks = build_adjacency_graph(faasr_payload)
-
-    # Initialize empty recursion call stack
-    stack = []
-
-    # Initialize empty visited set
-    visited = set()
-
-    # Find initial function in the graph
-    start = False
-    for func in faasr_payload["ActionList"]:
-        if ranks[func] == 0:
-            start = True
-            # This function stores the first function with no predecessors
-            # In the cases where there is multiple functions with no
-            # predecessors, an unreachable state error will occur later
-            first_func = func
-            break
-
-    # Ensure there is an initial action
-    if start is False:
-        logger.error("Function loop found: no initial action")
-        sys.exit(1)
-
-    # Check for cycles
-    is_cyclic(adj_graph, first_func, visited, stack)
-
-    # Check if all of the functions have been visited by the DFS
-    # If not, then there is an unreachable state in the graph
-    for func in faasr_payload["ActionList"]:
-        if func.split(".")[0] not in visited:
-            logger.error(f"Unreachable state found: {func}")
-            sys.exit(1)
-
-    # Initialize predecessor list
-    pre = predecessors_list(adj_graph)
-
-    curr_pre = pre[faasr_payload["FunctionInvoke"]]
-    real_pre = []
-    for p in curr_pre:
-        if p in ranks and ranks[p] > 1:
-            for i in range(1, ranks[p] + 1):
-                real_pre.append(f"{p}.{i}")
-        else:
-            real_pre.append(p)
-    return real_pre
-
 def get_github_token():
     # Get GitHub PAT from environment variable
     token = os.getenv('GITHUB_TOKEN')
@@ -216,11 +115,11 @@ def get_github_token():
         sys.exit(1)
     return token
 
-def get_aws_credentials():
+def get_aws_credentials(server_config=None):
     # Try to get AWS credentials from environment variables
     aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
     aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
-    aws_region = 'us-east-1'
+    aws_region = get_lambda_region(server_config or {})
     role_arn = os.getenv('AWS_LAMBDA_ROLE_ARN')
     
     if not all([aws_access_key, aws_secret_key, role_arn]):
@@ -236,94 +135,212 @@ def set_github_variable(repo_full_name, var_name, var_value, github_token):
         "Accept": "application/vnd.github+json"
     }
     data = {"name": var_name, "value": var_value}
+
+    def request(method, request_url):
+        r = requests.request(method, request_url, headers=headers, json=data)
+        r.raise_for_status()
+        return r
+
     # Try to update, if not found, create
-    r = requests.patch(url, headers=headers, json=data)
-    if r.status_code == 404:
-        r = requests.post(f"https://api.github.com/repos/{repo_full_name}/actions/variables", headers=headers, json=data)
-    if not r.ok:
-        print(f"Failed to set variable {var_name}: {r.text}")
-    else:
-        print(f"Set variable {var_name} for {repo_full_name}")
+    try:
+        call_with_retry('github', request, 'PATCH', url)
+    except requests.HTTPError as e:
+        if not is_not_found(e):
+            print(f"Failed to set variable {var_name}: {e.response.text}")
+            raise
+        call_with_retry('github', request, 'POST', f"https://api.github.com/repos/{repo_full_name}/actions/variables")
+    print(f"Set variable {var_name} for {repo_full_name}")
 
 def ensure_github_secrets_and_vars(repo, required_secrets, required_vars, github_token):
     """Set GitHub secrets and variables for the repository."""
     # Check and set secrets
-    existing_secrets = {s.name for s in repo.get_secrets()}
+    existing_secrets = {s.name for s in call_with_retry('github', lambda: list(repo.get_secrets()))}
     for secret_name, secret_value in required_secrets.items():
         if secret_name not in existing_secrets:
             print(f"Setting secret: {secret_name}")
         else:
             print(f"Secret {secret_name} already exists, updating it.")
-        repo.create_secret(secret_name, secret_value)
+        call_with_retry('github', repo.create_secret, secret_name, secret_value)
 
     # Set variables using REST API
     for var_name, var_value in required_vars.items():
         set_github_variable(repo.full_name, var_name, var_value, github_token)
 
+def build_secret_payload(workflow_data):
+    """
+    Returns the secret payload as a dict: all necessary credentials and the complete
+    workflow configuration. The credential placeholders of every ComputeServer and
+    DataStore are resolved through credentials.py, replaced in a deep copy of the
+    workflow and also listed at the top level under their placeholder names.
+    """
+    # Add workflow data (excluding local bookkeeping such as _workflow_file)
+    workflow_copy = {k: v for k, v in workflow_data.items() if not k.startswith('_')}
+    credentials = resolve_placeholders(workflow_copy)
+
+    payload = dict(credentials)
+    payload.update(substitute_credentials(workflow_copy, credentials))
+    return payload
+
 def create_secret_payload(workflow_data):
     """
-    Create a secret payload that combines all necessary credentials and the complete workflow configuration.
-    This payload will be stored as a GitHub secret and used by the deployed functions.
-    This function matches the logic from build_faasr_payload in trigger_function.py
-    """
-    # Start with credentials at the top
-    credentials = {
-        "My_GitHub_Account_TOKEN": get_github_token(),
-        "My_Minio_Bucket_ACCESS_KEY": os.getenv('MINIO_ACCESS_KEY'),
-        "My_Minio_Bucket_SECRET_KEY": os.getenv('MINIO_SECRET_KEY'),
-        "My_OW_Account_API_KEY": os.getenv('OW_API_KEY', ''),
-        "My_Lambda_Account_ACCESS_KEY": os.getenv('AWS_ACCESS_KEY_ID', ''),
-        "My_Lambda_Account_SECRET_KEY": os.getenv('AWS_SECRET_ACCESS_KEY', ''),
+    Create the secret payload as canonical JSON. This payload will be stored as
+    a GitHub secret (or Lambda environment variable) and used by the deployed functions.
+    """
+    return canonical_json(build_secret_payload(workflow_data)).decode('utf-8')
+
+def check_payload_budgets(workflow_data):
+    """
+    Check SECRET_PAYLOAD against the budget of every platform the workflow is
+    deployed to, before anything is deployed. Prints which sections use the bytes
+    when the payload is close to a budget, and exits when it is over one.
+    """
+    payload = build_secret_payload(workflow_data)
+    secret_payload = canonical_json(payload).decode('utf-8')
+    payload_size = len(secret_payload.encode('utf-8'))
+    record_payload_size('secret', payload_size)
+
+    over = False
+    for platform in sorted(get_workflow_faas_types(workflow_data) & set(PAYLOAD_BUDGETS)):
+        if platform == 'lambda':
+            # The limit covers every variable name and value of the function
+            size = sum(len(k.encode('utf-8')) + len(v.encode('utf-8'))
+                       for k, v in get_lambda_environment(workflow_data, secret_payload).items())
+            what = "Lambda environment"
+        else:
+            size = payload_size
+            what = "SECRET_PAYLOAD"
+        budget = PAYLOAD_BUDGETS[platform]
+        if size > budget:
+            print(f"Error: {what} is {size} bytes, over the {platform} budget of {budget} bytes")
+            over = True
+        elif size > budget * BUDGET_WARN_RATIO:
+            print(f"Warning: {what} is {size} bytes, {100 * size / budget:.0f}% of the {platform} budget")
+        else:
+            continue
+        print(f"SECRET_PAYLOAD sections ({payload_size} bytes):\n{format_section_report(payload, payload_size)}")
+
+    if over:
+        print("Reduce the workflow (e.g. move large Arguments to the DataStore) or deploy it to another platform")
+        sys.exit(1)
+
+def get_payload_locator_json(workflow_data):
+    """Returns the published payload locator as a JSON string, or None if nothing was published"""
+    locator = workflow_data.get('_payload_locator')
+    return json.dumps(locator, sort_keys=True) if locator else None
+
+def git_blob_sha(content):
+    """Returns the git blob SHA of a text file, as reported by the contents API"""
+    data = content.encode('utf-8')
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+def list_github_workflow_files(repo, json_prefix, branch):
+    """
+    Lists the workflow files under the {WorkflowName}- prefix with a single
+    directory listing call
+
+    Returns:
+        dict: {path: sha}
+    """
+    try:
+        contents = call_with_retry('github', repo.get_contents, ".github/workflows", ref=branch)
+    except Exception as e:
+        if is_not_found(e):
+            return {}
+        raise
+    return {
+        c.path: c.sha for c in contents
+        if c.name.startswith(f"{json_prefix}-") and c.name.endswith(".yml")
     }
-    
-    payload = credentials.copy()
 
-    # Add workflow data (excluding _workflow_file)
-    workflow_copy = workflow_data.copy()
-    if '_workflow_file' in workflow_copy:
-        del workflow_copy['_workflow_file']
-    payload.update(workflow_copy)
-    
-    # Replace placeholder values in ComputeServers with actual credentials
-    if 'ComputeServers' in payload:
-        for server_key, server_config in payload['ComputeServers'].items():
-            faas_type = server_config.get('FaaSType', '')
-            
-            # Replace placeholder values with actual credentials
-            if faas_type == 'Lambda':
-                # Replace Lambda AccessKey/SecretKey placeholders
-                if 'AccessKey' in server_config and server_config['AccessKey'] == f"{server_key}_ACCESS_KEY":
-                    if credentials['My_Lambda_Account_ACCESS_KEY']:
-                        server_config['AccessKey'] = credentials['My_Lambda_Account_ACCESS_KEY']
-                if 'SecretKey' in server_config and server_config['SecretKey'] == f"{server_key}_SECRET_KEY":
-                    if credentials['My_Lambda_Account_SECRET_KEY']:
-                        server_config['SecretKey'] = credentials['My_Lambda_Account_SECRET_KEY']
-            elif faas_type == 'GitHubActions':
-                # Replace GitHub Token placeholder
-                if 'Token' in server_config and server_config['Token'] == f"{server_key}_TOKEN":
-                    if credentials['My_GitHub_Account_TOKEN']:
-                        server_config['Token'] = credentials['My_GitHub_Account_TOKEN']
-            elif faas_type == 'OpenWhisk':
-                # Replace OpenWhisk API.key placeholder
-                if 'API.key' in server_config and server_config['API.key'] == f"{server_key}_API_KEY":
-                    if credentials['My_OW_Account_API_KEY']:
-                        server_config['API.key'] = credentials['My_OW_Account_API_KEY']
-
-    # Replace placeholder values in DataStores with actual credentials
-    if 'DataStores' in payload:
-        for store_key, store_config in payload['DataStores'].items():
-            # Replace placeholder values with actual credentials
-            if 'AccessKey' in store_config and store_config['AccessKey'] == f"{store_key}_ACCESS_KEY":
-                if store_key == 'My_Minio_Bucket' and credentials['My_Minio_Bucket_ACCESS_KEY']:
-                    store_config['AccessKey'] = credentials['My_Minio_Bucket_ACCESS_KEY']
-            if 'SecretKey' in store_config and store_config['SecretKey'] == f"{store_key}_SECRET_KEY":
-                if store_key == 'My_Minio_Bucket' and credentials['My_Minio_Bucket_SECRET_KEY']:
-                    store_config['SecretKey'] = credentials['My_Minio_Bucket_SECRET_KEY']
-    
-    return json.dumps(payload)
+def update_workflow_file(repo, path, content, message, sha, branch):
+    """
+    Update a workflow file from the blob sha it was read at. If the file changed
+    in between (409, stale sha), read it again and retry from its new sha, unless
+    it already holds the content.
+    """
+    for attempt in range(GITHUB_STALE_SHA_RETRIES + 1):
+        try:
+            call_with_retry('github', repo.update_file, path=path, message=message, content=content,
+                            sha=sha, branch=branch)
+            return
+        except Exception as e:
+            if not is_precondition_failed(e) or attempt == GITHUB_STALE_SHA_RETRIES:
+                raise
+        current = call_with_retry('github', repo.get_contents, path, ref=branch)
+        if current.decoded_content.decode('utf-8').strip() == content.strip():
+            print(f"File {path} was updated to the same content meanwhile, skipping update")
+            return
+        print(f"File {path} changed while updating it, retrying from its new sha")
+        sha = current.sha
+
+def generated_workflow_file(repo, path, branch, json_prefix):
+    """True if the workflow file at path was generated for the json_prefix workflow"""
+    contents = call_with_retry('github', repo.get_contents, path, ref=branch)
+    return is_generated_workflow(contents.decoded_content.decode('utf-8'), json_prefix)
+
+def reconcile_github_workflows(repo, desired_files, branch, json_prefix):
+    """
+    Creates, updates and deletes workflow files so that the {WorkflowName}- prefix
+    holds exactly the desired set. Unchanged files are detected by comparing blob
+    SHAs from the listing, so they cost no extra API calls. A file is only deleted
+    if it carries the marker of a file generated for this workflow; another
+    workflow whose name shares the prefix, or a hand-written file, is left alone.
+
+    Every file operation is a commit on the same branch, so they are applied one
+    at a time to avoid conflicting parent SHAs.
+
+    Arguments:
+        repo: PyGithub repository
+        desired_files: {path: (action_name, prefixed_action_name, container_image, content)}
+        branch: branch to commit to
+        json_prefix: workflow name prefix
+    """
+    existing = list_github_workflow_files(repo, json_prefix, branch)
+
+    for path, (action_name, prefixed_action_name, container_image, content) in desired_files.items():
+        check_lease()
+        with track_deploy(action_name, 'githubactions', prefixed_action_name, container_image):
+            if path not in existing:
+                print(f"File {path} doesn't exist, creating...")
+                call_with_retry(
+                    'github', repo.create_file,
+                    path=path,
+                    message=f"Add workflow for {prefixed_action_name}",
+                    content=content,
+                    branch=branch
+                )
+            elif existing[path] != git_blob_sha(content):
+                print(f"File {path} exists, updating...")
+                update_workflow_file(repo, path, content, f"Update workflow for {prefixed_action_name}",
+                                     existing[path], branch)
+            else:
+                print(f"File {path} content is already up to date, skipping update")
+
+    deleted = 0
+    for path in sorted(set(existing) - set(desired_files)):
+        if not generated_workflow_file(repo, path, branch, json_prefix):
+            print(f"File {path} was not generated for workflow {json_prefix}, leaving it")
+            continue
+        check_lease()
+        print(f"File {path} is no longer in the workflow, deleting...")
+        call_with_retry(
+            'github', repo.delete_file,
+            path=path,
+            message=f"Remove stale workflow {os.path.basename(path)}",
+            sha=existing[path],
+            branch=branch
+        )
+        deleted += 1
 
-def deploy_to_github(workflow_data):
-    """Deploy functions to GitHub Actions."""
+    print(f"Reconciled GitHub workflows: {len(desired_files)} desired, {deleted} deleted")
+
+def deploy_to_github(workflow_data, reconcile=False, only=None):
+    """
+    Deploy functions to GitHub Actions. The secret and variables are always
+    updated; when only is given, just those actions' workflow files are written.
+    Reconcile mode runs even when no action is left on GitHub Actions, so the
+    workflow files of removed actions are deleted.
+    """
     github_token = get_github_token()
     g = Github(github_token)
     
@@ -346,26 +363,36 @@ def deploy_to_github(workflow_data):
         if faas_type in ['githubactions', 'github_actions', 'github']:
             github_actions[action_name] = action_data
     
-    if not github_actions:
+    if not github_actions and not reconcile:
         print("No actions found for GitHub Actions deployment")
         return
     
     try:
-        repo = g.get_repo(repo_name)
+        repo = call_with_retry('github', g.get_repo, repo_name)
         
         # Get the default branch name
         default_branch = repo.default_branch
         print(f"Using branch: {default_branch}")
         
         # Create secret payload and set up secrets/variables
-        secret_payload = create_secret_payload(workflow_data)
-        required_secrets = {"SECRET_PAYLOAD": secret_payload}
-        vars = {f"{json_prefix.upper()}_PAYLOAD_REPO": f"{repo_name}/{workflow_data['_workflow_file']}"}
-        
-        ensure_github_secrets_and_vars(repo, required_secrets, vars, github_token)
+        locator_var = None
+        if get_payload_locator_json(workflow_data):
+            locator_var = f"{json_prefix.upper()}_PAYLOAD_LOCATOR"
+        if github_actions:
+            secret_payload = create_secret_payload(workflow_data)
+            required_secrets = {"SECRET_PAYLOAD": secret_payload}
+            vars = {f"{json_prefix.upper()}_PAYLOAD_REPO": f"{repo_name}/{workflow_data['_workflow_file']}"}
+            if locator_var:
+                vars[locator_var] = get_payload_locator_json(workflow_data)
+
+            ensure_github_secrets_and_vars(repo, required_secrets, vars, github_token)
         
         # Deploy each action
+        desired_files = {}
+        ranked = ranked_actions(workflow_data)
         for action_name, action_data in github_actions.items():
+            if only is not None and action_name not in only:
+                continue
             actual_func_name = action_data['FunctionName']
             
             # Create prefixed action name using workflow_name-action_name format
@@ -373,241 +400,322 @@ def deploy_to_github(workflow_data):
             
             # Create workflow file
             # Get container image, with fallback to default
-            container_image = workflow_data.get('ActionContainers', {}).get(action_name, 'ghcr.io/faasr/github-actions-tidyverse')
+            container_image = get_action_image(workflow_data, action_name, 'githubactions')
             
-            workflow_content = f"""name: {prefixed_action_name}
-
-on:
-  workflow_dispatch:
-    inputs:
-      OVERWRITTEN:
-        description: 'overwritten fields'
-        required: true
-      PAYLOAD_URL:
-        description: 'url to payload'
-        required: true
-jobs:
-  run_docker_image:
-    runs-on: ubuntu-latest
-    container: {container_image}
-    env:
-      TOKEN: ${{{{ secrets.PAT }}}}
-      SECRET_PAYLOAD: ${{{{ secrets.SECRET_PAYLOAD }}}}
-      OVERWRITTEN: ${{{{ github.event.inputs.OVERWRITTEN }}}}
-      PAYLOAD_URL: ${{{{ github.event.inputs.PAYLOAD_URL }}}}
-    steps:
-    - name: run Python
-      run: |
-        cd /action
-        python3 faasr_entry.py
-"""
+            workflow_content = build_github_workflow_content(
+                json_prefix, prefixed_action_name, container_image, locator_var,
+                get_runner_config(workflow_data, action_name), action_name in ranked
+            )
             
             # Create or update the workflow file
             workflow_path = f".github/workflows/{prefixed_action_name}.yml"
-            try:
-                # Try to get the file first
-                contents = repo.get_contents(workflow_path)
-                existing_content = contents.decoded_content.decode('utf-8')
-                
-                # Check if content has changed
-                if existing_content.strip() == workflow_content.strip():
-                    print(f"File {workflow_path} content is already up to date, skipping update")
-                else:
-                    # If file exists and content is different, update it
-                    print(f"File {workflow_path} exists, updating...")
-                    repo.update_file(
-                        path=workflow_path,
-                        message=f"Update workflow for {prefixed_action_name}",
-                        content=workflow_content,
-                        sha=contents.sha,
-                        branch=default_branch
-                    )
-                    print(f"Successfully updated {workflow_path}")
-            except Exception as e:
-                if "Not Found" in str(e) or "404" in str(e):
+            if reconcile:
+                desired_files[workflow_path] = (action_name, prefixed_action_name, container_image, workflow_content)
+                continue
+            check_lease()
+            with track_deploy(action_name, 'githubactions', prefixed_action_name, container_image):
+                try:
+                    # Try to get the file first
+                    contents = call_with_retry('github', repo.get_contents, workflow_path)
+                except Exception as e:
+                    if not is_not_found(e):
+                        print(f"Error updating/creating {workflow_path}: {str(e)}")
+                        # Try to get more details about the error
+                        if hasattr(e, 'data'):
+                            print(f"Error details: {e.data}")
+                        if hasattr(e, 'status'):
+                            print(f"HTTP status: {e.status}")
+                        raise e
+                    contents = None
+
+                if contents is None:
                     # If file doesn't exist, create it
                     print(f"File {workflow_path} doesn't exist, creating...")
-                    repo.create_file(
+                    call_with_retry(
+                        'github', repo.create_file,
                         path=workflow_path,
                         message=f"Add workflow for {prefixed_action_name}",
                         content=workflow_content,
                         branch=default_branch
                     )
                     print(f"Successfully created {workflow_path}")
+                elif contents.decoded_content.decode('utf-8').strip() == workflow_content.strip():
+                    # Check if content has changed
+                    print(f"File {workflow_path} content is already up to date, skipping update")
                 else:
-                    print(f"Error updating/creating {workflow_path}: {str(e)}")
-                    # Try to get more details about the error
-                    if hasattr(e, 'data'):
-                        print(f"Error details: {e.data}")
-                    if hasattr(e, 'status'):
-                        print(f"HTTP status: {e.status}")
-                    raise e
+                    # If file exists and content is different, update it
+                    print(f"File {workflow_path} exists, updating...")
+                    update_workflow_file(repo, workflow_path, workflow_content,
+                                         f"Update workflow for {prefixed_action_name}", contents.sha, default_branch)
+                    print(f"Successfully updated {workflow_path}")
                     
-            print(f"Successfully deployed {prefixed_action_name} to GitHub")
+                print(f"Successfully deployed {prefixed_action_name} to GitHub")
+
+        if reconcile:
+            reconcile_github_workflows(repo, desired_files, default_branch, json_prefix)
             
     except Exception as e:
         print(f"Error deploying to GitHub: {str(e)}")
         sys.exit(1)
 
-def deploy_to_aws(workflow_data):
-    # Get AWS credentials
-    aws_access_key, aws_secret_key, aws_region, role_arn = get_aws_credentials()
-    
-    lambda_client = boto3.client(
-        'lambda',
-        aws_access_key_id=aws_access_key,
-        aws_secret_access_key=aws_secret_key,
-        region_name=aws_region
-    )
-    
-    # Get the workflow name for function naming
-    workflow_name = workflow_data.get('WorkflowName', 'default')
-    json_prefix = workflow_name
-    
-    # Create secret payload (same as GitHub deployment)
-    secret_payload = create_secret_payload(workflow_data)
-    
-    # Filter actions that should be deployed to AWS Lambda
-    lambda_actions = {}
+def get_lambda_client(aws_access_key, aws_secret_key, aws_region):
+    """
+    Returns a pooled Lambda client for the given region, creating it on first use
+    so that every action deployed to the same region reuses one connection pool
+    """
+    key = (aws_access_key, aws_region)
+    with _lambda_clients_lock:
+        if key not in _lambda_clients:
+            _lambda_clients[key] = boto3.client(
+                'lambda',
+                aws_access_key_id=aws_access_key,
+                aws_secret_access_key=aws_secret_key,
+                region_name=aws_region,
+                # Retries are handled by cloud_retry so every platform follows one policy
+                config=Config(max_pool_connections=LAMBDA_MAX_POOL_CONNECTIONS, retries={'max_attempts': 1})
+            )
+        return _lambda_clients[key]
+
+def get_action_datastore(workflow_data, action_data):
+    """
+    Returns (name, config) of the DataStore used by an action, falling back to the
+    workflow's DefaultDataStore
+    """
+    store_name = action_data.get('DataStore') or workflow_data.get('DefaultDataStore')
+    store_config = workflow_data.get('DataStores', {}).get(store_name)
+    if store_config is None:
+        return None, None
+    return store_name, store_config
+
+def group_lambda_actions(workflow_data):
+    """
+    Groups the Lambda actions of a workflow by (server name, region)
+
+    Arguments:
+        workflow_data: FaaSr payload dict
+    Returns:
+        dict: {(server_name, region): {action_name: action_data}}
+    """
+    groups = defaultdict(dict)
     for action_name, action_data in workflow_data['ActionList'].items():
         server_name = action_data['FaaSServer']
         server_config = workflow_data['ComputeServers'][server_name]
-        faas_type = server_config['FaaSType'].lower()
-        if faas_type in ['lambda', 'aws_lambda', 'aws']:
-            lambda_actions[action_name] = action_data
-    
-    if not lambda_actions:
-        print("No actions found for AWS Lambda deployment")
-        return
-    
-    # Process each action in the workflow
-    for action_name, action_data in lambda_actions.items():
+        if server_config['FaaSType'].lower() not in ['lambda', 'aws_lambda', 'aws']:
+            continue
+        region = get_lambda_region(server_config)
+        groups[(server_name, region)][action_name] = action_data
+
+        # Data living in another region adds transfer latency to every invocation
+        store_name, store_config = get_action_datastore(workflow_data, action_data)
+        store_region = store_config.get('Region') if store_config else None
+        if store_region and store_region != region:
+            logger.warning(
+                f"Action '{action_name}' runs in {region} but its DataStore "
+                f"'{store_name}' is in {store_region}; expect cross-region transfer latency"
+            )
+    return groups
+
+def wait_for_lambda_ready(lambda_client, prefixed_func_name, check_update_status):
+    """
+    Polls a Lambda function until it is Active (and, for updates, until the last
+    update succeeded). Exits on failure or timeout.
+    """
+    max_attempts = 60  # Wait up to 5 minutes
+    attempt = 0
+    while attempt < max_attempts:
         try:
-            actual_func_name = action_data['FunctionName']
-            
-            # Create prefixed function name using workflow_name-action_name format
-            prefixed_func_name = f"{json_prefix}-{action_name}"
-            
-            # Get container image for AWS Lambda (must be an Amazon ECR image URI)
-            container_image = workflow_data.get('ActionContainers', {}).get(action_name)
-            if not container_image:
-                container_image = '145342739029.dkr.ecr.us-east-1.amazonaws.com/aws-lambda-tidyverse:latest'
+            response = call_with_retry('lambda', lambda_client.get_function, FunctionName=prefixed_func_name)
+            state = response['Configuration']['State']
+            last_update_status = response['Configuration'].get('LastUpdateStatus')
+
+            if state == 'Active' and (not check_update_status or last_update_status == 'Successful'):
+                print(f"Function {prefixed_func_name} is now active")
+                return
+            elif state == 'Failed' or (check_update_status and last_update_status == 'Failed'):
+                print(f"Function {prefixed_func_name} {'update' if check_update_status else 'creation'} failed")
+                sys.exit(1)
+            else:
+                print(f"Function state: {state}, waiting...")
+                time.sleep(5)
+                attempt += 1
+        except Exception as e:
+            print(f"Error checking function state: {str(e)}")
+            time.sleep(5)
+            attempt += 1
+
+    print(f"Timeout waiting for {prefixed_func_name} to become ready")
+    sys.exit(1)
+
+def lambda_function_exists(lambda_client, prefixed_func_name):
+    """Probe a single Lambda function"""
+    try:
+        call_with_retry('lambda', lambda_client.get_function, FunctionName=prefixed_func_name)
+        return True
+    except Exception as e:
+        if is_not_found(e):
+            return False
+        raise
+
+def list_lambda_functions(lambda_client, json_prefix):
+    """
+    Lists the Lambda functions under the {WorkflowName}- prefix with paginated list calls
+
+    Returns:
+        dict: {function name: function ARN}
+    """
+    names = {}
+    marker = None
+    while True:
+        kwargs = {'MaxItems': 50}
+        if marker:
+            kwargs['Marker'] = marker
+        page = call_with_retry('lambda', lambda_client.list_functions, **kwargs)
+        for func in page['Functions']:
+            if func['FunctionName'].startswith(f"{json_prefix}-"):
+                names[func['FunctionName']] = func['FunctionArn']
+        marker = page.get('NextMarker')
+        if not marker:
+            return names
+
+def delete_lambda_function(lambda_client, func_name, func_arn, json_prefix):
+    """
+    Delete a Lambda function left behind by this workflow. Functions without the
+    workflow's owner tag (another workflow sharing the prefix, or one created by
+    hand) are left alone.
+
+    Returns:
+        bool: whether the function was deleted
+    """
+    tags = call_with_retry('lambda', lambda_client.list_tags, Resource=func_arn).get('Tags', {})
+    if tags.get(OWNER_TAG) != json_prefix:
+        print(f"Function {func_name} was not created for workflow {json_prefix}, leaving it")
+        return False
+    check_lease()
+    print(f"Function {func_name} is no longer in the workflow, deleting...")
+    call_with_retry('lambda', lambda_client.delete_function, FunctionName=func_name)
+    return True
+
+def get_lambda_environment(workflow_data, secret_payload):
+    """Environment variables for Lambda functions"""
+    environment_vars = {
+        'SECRET_PAYLOAD': secret_payload
+    }
+    if get_payload_locator_json(workflow_data):
+        environment_vars['PAYLOAD_LOCATOR'] = get_payload_locator_json(workflow_data)
+    return environment_vars
+
+def deploy_lambda_function(lambda_client, prefixed_func_name, container_image, role_arn, environment_vars, exists=None,
+                           owner=None):
+    """
+    Create or update a single Lambda function. When exists is None the function
+    is probed first; reconcile mode passes the answer from its listing instead.
+    The function is tagged with owner, the WorkflowName it is deployed for.
+    """
+    # Check if function already exists first
+    if exists is None:
+        exists = lambda_function_exists(lambda_client, prefixed_func_name)
+
+    if exists:
+        print(f"Function {prefixed_func_name} already exists, updating...")
+        # With a pinned digest we can tell whether the deployed code is already current
+        current = None
+        if image_digest(container_image):
+            current = call_with_retry('lambda', lambda_client.get_function, FunctionName=prefixed_func_name)
+
+        if current and image_digest(current['Code'].get('ResolvedImageUri', '')) == image_digest(container_image):
+            print(f"Function {prefixed_func_name} already runs {image_digest(container_image)}, skipping code update")
+        else:
+            # Update existing function
+            call_with_retry(
+                'lambda', lambda_client.update_function_code,
+                FunctionName=prefixed_func_name,
+                ImageUri=container_image
+            )
+
+            # Wait for the function update to complete
+            print(f"Waiting for {prefixed_func_name} code update to complete...")
+            wait_for_lambda_ready(lambda_client, prefixed_func_name, check_update_status=True)
+
+        # Now update environment variables
+        if current and current['Configuration'].get('Environment', {}).get('Variables') == environment_vars:
+            print(f"Function {prefixed_func_name} environment is already up to date")
+            func_arn = current['Configuration']['FunctionArn']
+        else:
+            response = call_with_retry(
+                'lambda', lambda_client.update_function_configuration,
+                FunctionName=prefixed_func_name,
+                Environment={'Variables': environment_vars}
+            )
+            func_arn = response['FunctionArn']
+
+        # Functions created before they were tagged get their owner tag on the next update
+        if owner and (not current or current.get('Tags', {}).get(OWNER_TAG) != owner):
+            call_with_retry('lambda', lambda_client.tag_resource, Resource=func_arn, Tags={OWNER_TAG: owner})
+        print(f"Successfully updated {prefixed_func_name} on AWS Lambda")
+
+    else:
+        # Function doesn't exist, create it
+        print(f"Creating new Lambda function: {prefixed_func_name}")
+
+        # Create function with minimal parameters first, then update
+        print("Creating with minimal parameters...")
+        try:
+            call_with_retry(
+                'lambda', lambda_client.create_function,
+                FunctionName=prefixed_func_name,
+                PackageType='Image',
+                Code={'ImageUri': container_image},
+                Role=role_arn,
+                Timeout=300,  # Shorter timeout
+                MemorySize=128,  # Minimal memory
+                Tags={OWNER_TAG: owner} if owner else {},
+            )
+            print(f"Successfully created {prefixed_func_name} with minimal parameters")
+
+            # Wait for the function to become active before updating
+            print(f"Waiting for {prefixed_func_name} to become active...")
+            wait_for_lambda_ready(lambda_client, prefixed_func_name, check_update_status=False)
+
+            # Now update with full configuration
+            call_with_retry(
+                'lambda', lambda_client.update_function_configuration,
+                FunctionName=prefixed_func_name,
+                Timeout=900,
+                MemorySize=1024,
+                Environment={'Variables': environment_vars}
+            )
+            print(f"Updated {prefixed_func_name} with full configuration")
+
+        except Exception as minimal_error:
+            print(f"Minimal creation failed: {minimal_error}")
+            raise minimal_error
+
+def deploy_lambda_action(workflow_data, lambda_client, aws_region, role_arn, action_name, secret_payload, exists=None):
+    """Resolve the image of one action and deploy it to Lambda"""
+    json_prefix = workflow_data.get('WorkflowName', 'default')
+    # Create prefixed function name using workflow_name-action_name format
+    prefixed_func_name = f"{json_prefix}-{action_name}"
+    # Get container image for AWS Lambda (must be an Amazon ECR image URI)
+    container_image = get_action_image(workflow_data, action_name, 'lambda')
+    check_lease()
+    with track_deploy(action_name, 'lambda', prefixed_func_name, container_image):
+        try:
+            if action_name not in workflow_data.get('ActionContainers', {}):
                 print(f"No container specified for action '{action_name}', using default: {container_image}")
- 
-            # Check payload size before deployment
-            payload_size = len(secret_payload.encode('utf-8'))
-            if payload_size > 4000:  # Lambda env var limit is ~4KB
-                print(f"Warning: SECRET_PAYLOAD size ({payload_size} bytes) may exceed Lambda environment variable limits")
-                print("Consider using Parameter Store or S3 for large payloads")
-            
-            # Environment variables for Lambda function
-            environment_vars = {
-                'SECRET_PAYLOAD': secret_payload
-            }
-            
-            # Check if function already exists first
-            try:
-                existing_func = lambda_client.get_function(FunctionName=prefixed_func_name)
-                print(f"Function {prefixed_func_name} already exists, updating...")
-                # Update existing function
-                lambda_client.update_function_code(
-                    FunctionName=prefixed_func_name,
-                    ImageUri=container_image
-                )
-                
-                # Wait for the function update to complete
-                print(f"Waiting for {prefixed_func_name} code update to complete...")
-                max_attempts = 60  # Wait up to 5 minutes
-                attempt = 0
-                while attempt < max_attempts:
-                    try:
-                        response = lambda_client.get_function(FunctionName=prefixed_func_name)
-                        state = response['Configuration']['State']
-                        last_update_status = response['Configuration']['LastUpdateStatus']
-                        
-                        if state == 'Active' and last_update_status == 'Successful':
-                            break
-                        elif state == 'Failed' or last_update_status == 'Failed':
-                            sys.exit(1)
-                        else:
-                            time.sleep(5)
-                            attempt += 1
-                    except Exception as e:
-                        print(f"Error checking function state: {str(e)}")
-                        time.sleep(5)
-                        attempt += 1
-                
-                if attempt >= max_attempts:
-                    print(f"Timeout waiting for {prefixed_func_name} update to complete")
-                    sys.exit(1)
-                
-                # Now update environment variables
-                lambda_client.update_function_configuration(
-                    FunctionName=prefixed_func_name,
-                    Environment={'Variables': environment_vars}
+
+            # Lambda only pulls images from ECR in the function's own region
+            ecr_match = re.match(r'^\d+\.dkr\.ecr\.([a-z0-9-]+)\.amazonaws\.com/', container_image)
+            if ecr_match and ecr_match.group(1) != aws_region:
+                logger.warning(
+                    f"Image for '{action_name}' is in ECR region {ecr_match.group(1)} "
+                    f"but the function is deployed to {aws_region}"
                 )
-                print(f"Successfully updated {prefixed_func_name} on AWS Lambda")
-                
-            except lambda_client.exceptions.ResourceNotFoundException:
-                # Function doesn't exist, create it
-                print(f"Creating new Lambda function: {prefixed_func_name}")
-                
-                # Create function with minimal parameters first, then update
-                print("Creating with minimal parameters...")
-                try:
-                    lambda_client.create_function(
-                        FunctionName=prefixed_func_name,
-                        PackageType='Image',
-                        Code={'ImageUri': container_image},
-                        Role=role_arn,
-                        Timeout=300,  # Shorter timeout
-                        MemorySize=128,  # Minimal memory
-                    )
-                    print(f"Successfully created {prefixed_func_name} with minimal parameters")
-                    
-                    # Wait for the function to become active before updating
-                    print(f"Waiting for {prefixed_func_name} to become active...")
-                    max_attempts = 60  # Wait up to 5 minutes
-                    attempt = 0
-                    while attempt < max_attempts:
-                        try:
-                            response = lambda_client.get_function(FunctionName=prefixed_func_name)
-                            state = response['Configuration']['State']
-                            
-                            if state == 'Active':
-                                print(f"Function {prefixed_func_name} is now active")
-                                break
-                            elif state == 'Failed':
-                                print(f"Function {prefixed_func_name} creation failed")
-                                sys.exit(1)
-                            else:
-                                print(f"Function state: {state}, waiting...")
-                                time.sleep(5)
-                                attempt += 1
-                        except Exception as e:
-                            print(f"Error checking function state: {str(e)}")
-                            time.sleep(5)
-                            attempt += 1
-                    
-                    if attempt >= max_attempts:
-                        print(f"Timeout waiting for {prefixed_func_name} to become active")
-                        sys.exit(1)
-                    
-                    # Now update with full configuration
-                    lambda_client.update_function_configuration(
-                        FunctionName=prefixed_func_name,
-                        Timeout=900,
-                        MemorySize=1024,
-                        Environment={'Variables': environment_vars}
-                    )
-                    print(f"Updated {prefixed_func_name} with full configuration")
-                    
-                except Exception as minimal_error:
-                    print(f"Minimal creation failed: {minimal_error}")
-                    raise minimal_error
-            
+
+            deploy_lambda_function(lambda_client, prefixed_func_name, container_image, role_arn,
+                                   get_lambda_environment(workflow_data, secret_payload), exists, json_prefix)
+
         except Exception as e:
-            print(f"Error deploying {prefixed_func_name} to AWS: {str(e)}")
+            print(f"Error deploying {prefixed_func_name} to AWS ({aws_region}): {str(e)}")
             # Print additional debugging information
             if "RequestEntityTooLargeException" in str(e):
                 print(f"Payload too large. SECRET_PAYLOAD size: {len(secret_payload)} bytes")
@@ -616,106 +724,508 @@ def deploy_to_aws(workflow_data):
                 print("Check Lambda configuration parameters (memory, timeout, role)")
             sys.exit(1)
 
+def deploy_lambda_region(workflow_data, aws_region, actions, secret_payload, reconcile=False):
+    """
+    Deploy the Lambda actions of a workflow that run in one region, whichever
+    ComputeServer they belong to. AWS credentials come from the environment, so
+    every server in a region shares one account and one client.
 
-def get_openwhisk_credentials(workflow_data):
-    # Get OpenWhisk server configuration from workflow data
-    for server_name, server_config in workflow_data['ComputeServers'].items():
-        if server_config['FaaSType'].lower() == 'openwhisk':
-            return (
-                server_config['Endpoint'],
-                server_config['Namespace'],
-                server_config['SSL'].lower() == 'true'
-            )
-    
-    print("Error: No OpenWhisk server configuration found in workflow data")
-    sys.exit(1)
+    In reconcile mode the region is listed once instead of probing each function,
+    actions are created/updated concurrently, and functions this workflow created
+    in the region (see delete_lambda_function) that no Lambda action of it deploys
+    there any more are deleted.
+    """
+    aws_access_key, aws_secret_key, aws_region, role_arn = get_aws_credentials({'Region': aws_region})
+    lambda_client = get_lambda_client(aws_access_key, aws_secret_key, aws_region)
 
-def deploy_to_ow(workflow_data):
-    # Get OpenWhisk credentials
-    api_host, namespace, ssl = get_openwhisk_credentials(workflow_data)
-    
-    # Get the workflow name for prefixing
-    workflow_name = workflow_data.get('WorkflowName', 'default')
-    json_prefix = workflow_name
-    
-    # Filter actions that should be deployed to OpenWhisk
-    ow_actions = {}
+    json_prefix = workflow_data.get('WorkflowName', 'default')
+    print(f"Deploying {len(actions)} action(s) to {aws_region}")
+
+    if not reconcile:
+        for action_name in actions:
+            deploy_lambda_action(workflow_data, lambda_client, aws_region, role_arn, action_name, secret_payload)
+        return
+
+    existing = list_lambda_functions(lambda_client, json_prefix)
+    desired = {f"{json_prefix}-{action_name}": action_name for action_name in actions}
+    stale = sorted(set(existing) - set(desired))
+
+    with ThreadPoolExecutor(max_workers=RECONCILE_MAX_WORKERS) as executor:
+        futures = [
+            executor.submit(deploy_lambda_action, workflow_data, lambda_client, aws_region, role_arn,
+                            action_name, secret_payload, prefixed_func_name in existing)
+            for prefixed_func_name, action_name in desired.items()
+        ]
+        deletions = [
+            executor.submit(delete_lambda_function, lambda_client, func_name, existing[func_name], json_prefix)
+            for func_name in stale
+        ]
+        for future in as_completed(futures + deletions):
+            future.result()
+
+    deleted = sum(future.result() for future in deletions)
+    print(f"Reconciled Lambda functions in {aws_region}: {len(desired)} desired, {deleted} deleted")
+
+def get_lambda_regions(workflow_data, reconcile=False, extra_regions=()):
+    """
+    Returns {region: [action_name, ...]} of the workflow's Lambda actions. In
+    reconcile mode the region of every Lambda ComputeServer, and each of
+    extra_regions, is included even when no action runs there any more, so its
+    leftover functions are deleted. Any other region is never listed.
+    """
+    regions = defaultdict(list)
+    for (server_name, region), actions in group_lambda_actions(workflow_data).items():
+        regions[region].extend(actions)
+    if reconcile:
+        for server_config in workflow_data['ComputeServers'].values():
+            if server_config['FaaSType'].lower() in ['lambda', 'aws_lambda', 'aws']:
+                regions.setdefault(get_lambda_region(server_config), [])
+        for region in extra_regions:
+            regions.setdefault(region, [])
+    return regions
+
+def deploy_to_aws(workflow_data, reconcile=False, extra_regions=()):
+    # Create secret payload (same as GitHub deployment)
+    secret_payload = create_secret_payload(workflow_data)
+
+    # Group actions that should be deployed to AWS Lambda by region. Every server
+    # in a region is deployed (and reconciled) together, so one server's functions
+    # are never taken for stale by another's.
+    lambda_regions = get_lambda_regions(workflow_data, reconcile, extra_regions)
+
+    if not lambda_regions:
+        print("No actions found for AWS Lambda deployment")
+        return
+
+    # Deploy each region concurrently; a failure in any region aborts the run
+    with ThreadPoolExecutor(max_workers=len(lambda_regions)) as executor:
+        futures = {
+            executor.submit(deploy_lambda_region, workflow_data, region, actions, secret_payload, reconcile): region
+            for region, actions in lambda_regions.items()
+        }
+        for future in as_completed(futures):
+            future.result()
+
+
+def get_json(url, **kwargs):
+    """GET a JSON document, raising requests.HTTPError on an error status"""
+    r = requests.get(url, **kwargs)
+    r.raise_for_status()
+    return r.json()
+
+def list_ow_actions(api_host, namespace, ow_api_key, json_prefix):
+    """
+    Lists the OpenWhisk actions under the {WorkflowName}- prefix through the REST
+    API, one page of OW_LIST_PAGE_SIZE actions per call
+
+    Returns:
+        dict: {action name: WorkflowName in its owner annotation, or None}
+    """
+    api_url = get_ow_api_url(api_host)
+    auth = get_ow_auth(ow_api_key)
+
+    names = {}
+    skip = 0
+    while True:
+        # Always use insecure mode to bypass certificate issues, as with the wsk CLI
+        page = call_with_retry(
+            'openwhisk', get_json,
+            f"{api_url}/api/v1/namespaces/{namespace}/actions",
+            params={'limit': OW_LIST_PAGE_SIZE, 'skip': skip},
+            auth=auth,
+            verify=False
+        )
+        names.update(
+            (a['name'], {x['key']: x['value'] for x in a.get('annotations', [])}.get(OWNER_TAG))
+            for a in page if a['name'].startswith(f"{json_prefix}-")
+        )
+        if len(page) < OW_LIST_PAGE_SIZE:
+            return names
+        skip += OW_LIST_PAGE_SIZE
+
+def deploy_ow_action(prefixed_func_name, container_image, env, exists=None, params=None, owner=None):
+    """
+    Create or update a single OpenWhisk action. When exists is None the action
+    is probed first; reconcile mode passes the answer from its listing instead.
+    params are bound to the action as default parameters, and owner, the
+    WorkflowName it is deployed for, as an annotation. With a pinned image
+    digest an existing action is read either way, and left as is when it
+    already runs that digest with the same parameters and owner.
+    """
+    try:
+        check = None
+        if exists is None or (exists and image_digest(container_image)):
+            # First check if action exists (add --insecure flag)
+            check_cmd = f"wsk action get {prefixed_func_name} --insecure"
+            try:
+                check = run_command(check_cmd, env)
+                exists = True
+            except Exception as e:
+                if not is_not_found(e):
+                    raise
+                exists = False
+
+        # With a pinned digest we can tell whether the deployed action is already current
+        if check is not None and image_digest(container_image):
+            current = json.loads(check.stdout.split('\n', 1)[1])
+            current_params = {p['key']: p['value'] for p in current.get('parameters', [])}
+            current_owner = {a['key']: a['value'] for a in current.get('annotations', [])}.get(OWNER_TAG)
+            if (image_digest(current.get('exec', {}).get('image', '')) == image_digest(container_image)
+                    and current_params == (params or {}) and current_owner == owner):
+                print(f"Action {prefixed_func_name} already runs {image_digest(container_image)}, skipping update")
+                return
+
+        param_args = "".join(f" --param {name} {shlex.quote(value)}" for name, value in (params or {}).items())
+        if owner:
+            param_args += f" --annotation {OWNER_TAG} {shlex.quote(owner)}"
+        if exists:
+            # Update existing action (add --insecure flag)
+            cmd = f"wsk action update {prefixed_func_name} --docker {container_image}{param_args} --insecure"
+        else:
+            # Create new action (add --insecure flag)
+            cmd = f"wsk action create {prefixed_func_name} --docker {container_image}{param_args} --insecure"
+
+        try:
+            run_command(cmd, env)
+        except Exception as e:
+            raise Exception(f"Failed to {'update' if exists else 'create'} action: {e}")
+
+        print(f"Successfully deployed {prefixed_func_name} to OpenWhisk")
+
+    except Exception as e:
+        print(f"Error deploying {prefixed_func_name} to OpenWhisk: {str(e)}")
+        sys.exit(1)
+
+def delete_ow_action(prefixed_func_name, env):
+    """Delete a single OpenWhisk action"""
+    print(f"Action {prefixed_func_name} is no longer in the workflow, deleting...")
+    try:
+        run_command(f"wsk action delete {prefixed_func_name} --insecure", env)
+    except Exception as e:
+        print(f"Error deleting {prefixed_func_name} from OpenWhisk: {e}")
+        sys.exit(1)
+
+def group_ow_actions(workflow_data):
+    """
+    Groups the OpenWhisk actions of a workflow by FaaSServer
+
+    Returns:
+        dict: {server_name: [action_name, ...]}
+    """
+    groups = defaultdict(list)
     for action_name, action_data in workflow_data['ActionList'].items():
         server_name = action_data['FaaSServer']
         server_config = workflow_data['ComputeServers'][server_name]
         faas_type = server_config['FaaSType'].lower()
         if faas_type in ['openwhisk', 'open_whisk', 'ow']:
-            ow_actions[action_name] = action_data
-    
-    if not ow_actions:
+            groups[server_name].append(action_name)
+    return groups
+
+def deploy_ow_server(workflow_data, server_name, action_names, reconcile=False, server_config=None):
+    """
+    Deploy the actions of one OpenWhisk ComputeServer. The wsk CLI gets its own
+    properties file (WSK_CONFIG_FILE) for this server, so servers, and concurrent
+    registrations on the same runner, never share the global ~/.wskprops.
+    server_config defaults to the server's entry in the workflow's ComputeServers.
+    """
+    # Get OpenWhisk credentials
+    api_host, namespace, ssl, ow_api_key = get_openwhisk_credentials(
+        server_name, server_config or workflow_data['ComputeServers'][server_name]
+    )
+
+    # Get the workflow name for prefixing
+    json_prefix = workflow_data.get('WorkflowName', 'default')
+
+    with tempfile.TemporaryDirectory(prefix='faasr-wsk-') as wsk_dir:
+        # Set environment variable to handle certificate issue
+        env = os.environ.copy()
+        env['GODEBUG'] = 'x509ignoreCN=0'
+        env['WSK_CONFIG_FILE'] = os.path.join(wsk_dir, 'wskprops')
+
+        # Set up wsk properties
+        run_command(f"wsk property set --apihost {shlex.quote(api_host)}", env)
+
+        # Set authentication using the server's API key
+        if ow_api_key:
+            run_command(f"wsk property set --auth {shlex.quote(ow_api_key)}", env)
+            print(f"Using OpenWhisk server {server_name} ({api_host}) with API key authentication")
+        else:
+            print(f"Using OpenWhisk server {server_name} ({api_host}) without authentication")
+
+        # Always use insecure flag to bypass certificate issues
+        run_command("wsk property set --insecure", env)
+
+        # Create prefixed function names using workflow_name-action_name format,
+        # qualified with the server's namespace
+        qualifier = f"/{namespace}/" if namespace and namespace != '_' else ""
+        desired = {
+            f"{json_prefix}-{action_name}": get_action_image(workflow_data, action_name, 'openwhisk')
+            for action_name in action_names
+        }
+
+        params = {}
+        if get_payload_locator_json(workflow_data):
+            params['PAYLOAD_LOCATOR'] = get_payload_locator_json(workflow_data)
+
+        def deploy(prefixed_func_name, container_image, exists=None):
+            action_name = prefixed_func_name[len(json_prefix) + 1:]
+            check_lease()
+            with track_deploy(action_name, 'openwhisk', prefixed_func_name, container_image):
+                deploy_ow_action(f"{qualifier}{prefixed_func_name}", container_image, env, exists, params, json_prefix)
+
+        if not reconcile:
+            # Process each action in the workflow
+            for prefixed_func_name, container_image in desired.items():
+                deploy(prefixed_func_name, container_image)
+            return
+
+        try:
+            existing = list_ow_actions(api_host, namespace, ow_api_key, json_prefix)
+        except Exception as e:
+            print(f"Error listing OpenWhisk actions on {server_name}: {str(e)}")
+            sys.exit(1)
+        # Only actions annotated with this workflow's name are its own to delete
+        stale = []
+        for func_name in sorted(set(existing) - set(desired)):
+            if existing[func_name] == json_prefix:
+                stale.append(func_name)
+            else:
+                print(f"Action {func_name} was not created for workflow {json_prefix}, leaving it")
+
+        def delete(func_name):
+            check_lease()
+            delete_ow_action(f"{qualifier}{func_name}", env)
+
+        with ThreadPoolExecutor(max_workers=RECONCILE_MAX_WORKERS) as executor:
+            futures = [
+                executor.submit(deploy, prefixed_func_name, container_image, prefixed_func_name in existing)
+                for prefixed_func_name, container_image in desired.items()
+            ]
+            futures += [executor.submit(delete, func_name) for func_name in stale]
+            for future in as_completed(futures):
+                future.result()
+
+        print(f"Reconciled OpenWhisk actions on {server_name}: {len(desired)} desired, {len(stale)} deleted")
+
+def get_ow_endpoints(workflow_data, extra_servers=None):
+    """
+    Groups every OpenWhisk ComputeServer of the workflow, and each of
+    extra_servers ({server_name: server_config}, e.g. servers a previous version
+    used), by (Endpoint, Namespace), even when no action runs on it any more.
+    Servers sharing a namespace are reconciled together, so one server's actions
+    are never taken for stale by another's.
+
+    Returns:
+        dict: {(endpoint, namespace): (server_name, server_config, [action_name, ...])}
+    """
+    servers = {
+        server_name: server_config for server_name, server_config in workflow_data['ComputeServers'].items()
+        if server_config['FaaSType'].lower() in ['openwhisk', 'open_whisk', 'ow']
+    }
+    for server_name, server_config in (extra_servers or {}).items():
+        servers.setdefault(server_name, server_config)
+    actions = group_ow_actions(workflow_data)
+
+    endpoints = {}
+    for server_name, server_config in sorted(servers.items()):
+        key = (server_config['Endpoint'], server_config.get('Namespace', '_'))
+        if key not in endpoints:
+            endpoints[key] = (server_name, server_config, [])
+        endpoints[key][2].extend(actions.get(server_name, []))
+    return endpoints
+
+def deploy_to_ow(workflow_data, reconcile=False, extra_servers=None):
+    # Group actions that should be deployed to OpenWhisk by server. Reconcile goes
+    # through every OpenWhisk namespace, so one whose actions were all removed is
+    # still cleaned up.
+    if reconcile:
+        ow_groups = [
+            (server_name, action_names, server_config)
+            for server_name, server_config, action_names in get_ow_endpoints(workflow_data, extra_servers).values()
+        ]
+    else:
+        ow_groups = [(server_name, action_names, None)
+                     for server_name, action_names in group_ow_actions(workflow_data).items()]
+
+    if not ow_groups:
         print("No actions found for OpenWhisk deployment")
         return
 
-    
-    # Set up wsk properties
-    subprocess.run(f"wsk property set --apihost {api_host}", shell=True)
-    
-    # Set authentication using API key from environment variable
-    ow_api_key = os.getenv('OW_API_KEY')
-    if ow_api_key:
-        subprocess.run(f"wsk property set --auth {ow_api_key}", shell=True)
-        print("Using OpenWhisk with API key authentication")
-    else:
-        print("Using OpenWhisk without authentication")
-    
-    # Always use insecure flag to bypass certificate issues
-    subprocess.run("wsk property set --insecure", shell=True)
-    
-    # Set environment variable to handle certificate issue
-    env = os.environ.copy()
-    env['GODEBUG'] = 'x509ignoreCN=0'
-    
-    # Process each action in the workflow
-    for action_name, action_data in ow_actions.items():
+    # Deploy each server concurrently; a failure on any server aborts the run
+    with ThreadPoolExecutor(max_workers=len(ow_groups)) as executor:
+        futures = [
+            executor.submit(deploy_ow_server, workflow_data, server_name, action_names, reconcile, server_config)
+            for server_name, action_names, server_config in ow_groups
+        ]
+        for future in as_completed(futures):
+            future.result()
+
+class PreflightError(Exception):
+    """Raised by a preflight check that failed"""
+
+
+def require_env(*names):
+    """Raise PreflightError listing every variable in names that is not set"""
+    missing = [name for name in names if not os.getenv(name)]
+    if missing:
+        raise PreflightError(f"missing environment variable(s): {', '.join(missing)}")
+
+def preflight_aws(server_name, server_config, timeout):
+    """STS get-caller-identity in the server's region, and a role ARN in the same account"""
+    require_env('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_LAMBDA_ROLE_ARN')
+    aws_region = get_lambda_region(server_config)
+    role_arn = os.getenv('AWS_LAMBDA_ROLE_ARN')
+    role_match = re.match(r'^arn:aws[a-z-]*:iam::(\d{12}):role/[\w+=,.@/-]+$', role_arn)
+    if not role_match:
+        raise PreflightError(f"AWS_LAMBDA_ROLE_ARN is not a valid IAM role ARN: {role_arn}")
+
+    sts = boto3.client(
+        'sts',
+        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+        region_name=aws_region,
+        config=Config(connect_timeout=timeout, read_timeout=timeout, retries={'max_attempts': 1})
+    )
+    try:
+        account = sts.get_caller_identity()['Account']
+    except Exception as e:
+        raise PreflightError(f"STS get-caller-identity failed in {aws_region}: {e}")
+    if role_match.group(1) != account:
+        raise PreflightError(f"role ARN belongs to account {role_match.group(1)}, credentials to {account}")
+    return f"account {account} in {aws_region}"
+
+def preflight_github(timeout, needs_repo, server_names=()):
+    """
+    Token scopes and push access to the repository that hosts the workflow files.
+    Without GitHub actions only the servers' token placeholders have to resolve.
+    """
+    if not needs_repo:
+        provider = get_credential_provider()
+        missing = [name for name in server_names if not provider.get(f"{name}_TOKEN", 'GITHUB_TOKEN')]
+        if missing:
+            raise PreflightError(f"no token for {', '.join(missing)} ({{ServerName}}_TOKEN or GITHUB_TOKEN)")
+        return "token set"
+    require_env('GITHUB_TOKEN', 'GITHUB_REPOSITORY')
+    repo_name = os.getenv('GITHUB_REPOSITORY')
+    headers = {
+        "Authorization": f"Bearer {os.getenv('GITHUB_TOKEN')}",
+        "Accept": "application/vnd.github+json"
+    }
+    r = requests.get(f"https://api.github.com/repos/{repo_name}", headers=headers, timeout=timeout)
+    if r.status_code in (401, 403, 404):
+        raise PreflightError(f"token cannot access {repo_name} (HTTP {r.status_code})")
+    r.raise_for_status()
+    if not r.json().get('permissions', {}).get('push'):
+        raise PreflightError(f"token has no push access to {repo_name}")
+
+    # Classic tokens report their scopes; fine-grained tokens do not send the header
+    scopes = r.headers.get('X-OAuth-Scopes')
+    if scopes is not None:
+        missing = {'repo', 'workflow'} - {scope.strip() for scope in scopes.split(',')}
+        if missing:
+            raise PreflightError(f"token is missing scope(s): {', '.join(sorted(missing))}")
+    return f"push access to {repo_name}"
+
+def preflight_openwhisk(server_name, server_config, timeout):
+    """Namespace visible to the server's API key on its endpoint"""
+    api_host, namespace, ssl, ow_api_key = get_openwhisk_credentials(server_name, server_config)
+    if not ow_api_key:
+        raise PreflightError(f"missing environment variable(s): {server_name}_API_KEY or OW_API_KEY")
+    api_url = get_ow_api_url(api_host)
+    # Always use insecure mode to bypass certificate issues, as with the wsk CLI
+    r = requests.get(f"{api_url}/api/v1/namespaces", auth=get_ow_auth(ow_api_key), verify=False, timeout=timeout)
+    if r.status_code in (401, 403):
+        raise PreflightError(f"API key rejected by {api_url} (HTTP {r.status_code})")
+    r.raise_for_status()
+    if namespace not in ('_', *r.json()):
+        raise PreflightError(f"namespace '{namespace}' not available on {api_url}")
+    return f"namespace {namespace} on {api_url}"
+
+def preflight_datastore(store_name, store_config, timeout):
+    """HeadBucket on the DataStore with its S3/MinIO credentials"""
+    if None in get_datastore_credentials(store_name, store_config):
+        raise PreflightError(f"no credentials found ({store_name}_ACCESS_KEY/_SECRET_KEY or "
+                             f"MINIO_ACCESS_KEY/MINIO_SECRET_KEY)")
+    s3 = get_s3_client(
+        store_name,
+        store_config,
+        Config(connect_timeout=timeout, read_timeout=timeout, retries={'max_attempts': 1})
+    )
+    try:
+        s3.head_bucket(Bucket=store_config['Bucket'])
+    except Exception as e:
+        raise PreflightError(f"cannot access bucket {store_config['Bucket']}: {e}")
+    return f"bucket {store_config['Bucket']}"
+
+def run_preflight(workflow_data, time_budget):
+    """
+    Check credentials and connectivity for every platform and DataStore the workflow
+    uses, in parallel, before anything is deployed. Exits if any check fails or the
+    checks do not finish within time_budget seconds.
+    """
+    platforms = get_workflow_faas_types(workflow_data)
+    checks = {}
+    for server_name, server_config in workflow_data['ComputeServers'].items():
+        faas_type = server_config.get('FaaSType', '').lower()
+        if faas_type in ['lambda', 'aws_lambda', 'aws'] and 'lambda' in platforms:
+            checks[f"Lambda {server_name}"] = (preflight_aws, server_name, server_config, time_budget)
+        elif faas_type in ['openwhisk', 'open_whisk', 'ow'] and 'openwhisk' in platforms:
+            checks[f"OpenWhisk {server_name}"] = (preflight_openwhisk, server_name, server_config, time_budget)
+    # Deploying to GitHub needs the repository; otherwise a GitHub server only
+    # contributes its token placeholder to the secret payload
+    github_servers = [
+        server_name for server_name, server_config in workflow_data['ComputeServers'].items()
+        if server_config.get('FaaSType', '').lower() in ['githubactions', 'github_actions', 'github']
+    ]
+    if 'githubactions' in platforms or github_servers:
+        checks["GitHub"] = (preflight_github, time_budget, 'githubactions' in platforms, github_servers)
+    for store_name, store_config in workflow_data.get('DataStores', {}).items():
+        checks[f"DataStore {store_name}"] = (preflight_datastore, store_name, store_config, time_budget)
+
+    print(f"Running {len(checks)} preflight check(s) with a {time_budget}s budget...")
+    executor = ThreadPoolExecutor(max_workers=len(checks))
+    futures = {executor.submit(*check): name for name, check in checks.items()}
+    done, not_done = wait(futures, timeout=time_budget)
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    failed = False
+    for future, name in futures.items():
+        if future in not_done:
+            print(f"✗ {name}: no answer within {time_budget}s")
+            failed = True
+            continue
         try:
-            actual_func_name = action_data['FunctionName']
-            
-            # Create prefixed function name using workflow_name-action_name format
-            prefixed_func_name = f"{json_prefix}-{action_name}"
-            
-            # Create or update OpenWhisk action using wsk CLI
-            try:
-                # First check if action exists (add --insecure flag)
-                check_cmd = f"wsk action get {prefixed_func_name} --insecure >/dev/null 2>&1"
-                exists = subprocess.run(check_cmd, shell=True, env=env).returncode == 0
-                
-                # Get container image, with fallback to default
-                container_image = workflow_data.get('ActionContainers', {}).get(action_name, 'ghcr.io/faasr/openwhisk-tidyverse')
-                
-                if exists:
-                    # Update existing action (add --insecure flag)
-                    cmd = f"wsk action update {prefixed_func_name} --docker {container_image} --insecure"
-                else:
-                    # Create new action (add --insecure flag)
-                    cmd = f"wsk action create {prefixed_func_name} --docker {container_image} --insecure"
-                
-                result = subprocess.run(cmd, shell=True, capture_output=True, text=True, env=env)
-                
-                if result.returncode != 0:
-                    raise Exception(f"Failed to {'update' if exists else 'create'} action: {result.stderr}")
-                
-                print(f"Successfully deployed {prefixed_func_name} to OpenWhisk")
-                
-            except Exception as e:
-                print(f"Error deploying {prefixed_func_name} to OpenWhisk: {str(e)}")
-                sys.exit(1)
-                
+            print(f"✓ {name}: {future.result()}")
         except Exception as e:
-            print(f"Error processing {prefixed_func_name}: {str(e)}")
-            sys.exit(1)
+            print(f"✗ {name}: {e}")
+            failed = True
+
+    if failed:
+        print("✗ Preflight failed - nothing was deployed")
+        sys.exit(1)
+    print("✓ Preflight passed")
+
+def record_registration(workflow_data, started_at, status, history_db=None):
+    """Append this registration to the history database; a failure here never fails the run"""
+    try:
+        record_payload_size('compiled', len(serialize_payload(compile_payload(workflow_data))))
+        store = HistoryStore(history_db)
+        try:
+            store.record_run('deploy', workflow_data.get('WorkflowName', 'default'), payload_version(workflow_data),
+                             started_at, status, retry_stats())
+        finally:
+            store.close()
+        print(f"Recorded registration in {store.path}")
+    except Exception as e:
+        print(f"Warning: could not record the registration history: {e}")
+
+def load_workflow(workflow_file):
+    """Read and validate a workflow file. Exits if it is invalid."""
+    workflow_data = read_workflow_file(workflow_file)
 
-def main():
-    args = parse_arguments()
-    workflow_data = read_workflow_file(args.workflow_file)
-    
     # Store the workflow file path in the workflow data
-    workflow_data['_workflow_file'] = args.workflow_file
-    
+    workflow_data['_workflow_file'] = workflow_file
+
     # Validate workflow for cycles and unreachable states
     print("Validating workflow for cycles and unreachable states...")
     try:
@@ -724,31 +1234,378 @@ def main():
     except SystemExit:
         print("✗ Workflow validation failed - check logs for details")
         sys.exit(1)
-    
-    # Get all unique FaaSTypes from workflow data
-    faas_types = set()
-    for server in workflow_data.get('ComputeServers', {}).values():
-        if 'FaaSType' in server:
-            faas_types.add(server['FaaSType'].lower())
-    
-    if not faas_types:
+
+    if not get_workflow_faas_types(workflow_data):
         print("Error: No FaaSType found in workflow file")
         sys.exit(1)
-    
-    print(f"Found FaaS platforms: {', '.join(faas_types)}")
-    
-    # Deploy to each platform found
-    for faas_type in faas_types:
-        print(f"\nDeploying to {faas_type}...")
+
+    # Check GitHub runner settings before any platform is modified
+    try:
+        for action_name in workflow_data['ActionList']:
+            if get_action_platform(workflow_data, action_name) == 'githubactions':
+                get_runner_config(workflow_data, action_name)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    return workflow_data
+
+def prepare_deploy(workflow_data, args, digest_cache):
+    """
+    Publish the compiled payload and pin action images, storing the results in
+    workflow_data, then check the secret payload against the platform budgets
+    """
+    # Publish the compiled payload so functions fetch it with one DataStore GET
+    if not args.skip_payload_publish:
+        try:
+            workflow_data['_payload_locator'] = publish_payload(workflow_data)
+        except Exception as e:
+            print(f"Error publishing payload to the DataStore: {str(e)}")
+            sys.exit(1)
+        if workflow_data['_payload_locator']:
+            print(f"Payload locator: {locator_to_str(workflow_data['_payload_locator'])}")
+
+    # Pin every image to its current digest so unchanged code is not redeployed
+    if not args.no_pin_digests:
+        print("Resolving container image digests...")
+        workflow_data['_resolved_images'] = resolve_workflow_images(
+            workflow_data,
+            lambda action_name: get_action_platform(workflow_data, action_name),
+            digest_cache
+        )
+
+    check_payload_budgets(workflow_data)
+
+def reconcile_platforms(workflow_data):
+    """
+    Platforms a reconcile run goes through: those with actions, and every platform
+    a ComputeServer of the workflow is on, so a platform, region or OpenWhisk
+    namespace whose actions were all removed is still cleaned up
+    """
+    platforms = set(get_workflow_faas_types(workflow_data))
+    for server_config in workflow_data['ComputeServers'].values():
+        faas_type = server_config['FaaSType'].lower()
         if faas_type in ['lambda', 'aws_lambda', 'aws']:
-            deploy_to_aws(workflow_data)
+            platforms.add('lambda')
         elif faas_type in ['githubactions', 'github_actions', 'github']:
-            deploy_to_github(workflow_data)
+            platforms.add('githubactions')
         elif faas_type in ['openwhisk', 'open_whisk', 'ow']:
-            deploy_to_ow(workflow_data)
-        else:
-            print(f"Warning: Unknown FaaSType '{faas_type}' - skipping")
-    
+            platforms.add('openwhisk')
+    return platforms
+
+def deploy_to_platform(workflow_data, platform, reconcile=False):
+    check_lease()
+    print(f"\nDeploying to {platform}...")
+    if platform == 'lambda':
+        deploy_to_aws(workflow_data, reconcile)
+    elif platform == 'githubactions':
+        deploy_to_github(workflow_data, reconcile)
+    elif platform == 'openwhisk':
+        deploy_to_ow(workflow_data, reconcile)
+
+def finish_run(workflow_data, started_at, status, args):
+    """Print the API call summary and record the run in the history database"""
+    summary = retry_summary()
+    if summary:
+        print(f"\nCloud API calls:\n{summary}")
+    if not args.no_history:
+        record_registration(workflow_data, started_at, status, args.history_db)
+    # Nothing carries over to the next deploy of a watch, whether or not it was recorded
+    reset_records()
+    reset_retry_stats()
+
+def action_deploy_spec(workflow_data, action_name):
+    """
+    Everything a deployed function depends on apart from the payload. When this
+    changes the action needs a full redeploy; otherwise refreshing the payload
+    references (SECRET_PAYLOAD, PAYLOAD_LOCATOR) is enough.
+    """
+    action_data = workflow_data['ActionList'][action_name]
+    platform = get_action_platform(workflow_data, action_name)
+    spec = {
+        'platform': platform,
+        'server': action_data['FaaSServer'],
+        'server_config': workflow_data['ComputeServers'][action_data['FaaSServer']],
+    }
+    if platform:
+        spec['image'] = get_action_image(workflow_data, action_name, platform)
+    if platform == 'githubactions':
+        spec['runner'] = get_runner_config(workflow_data, action_name)
+        spec['ranked'] = action_name in ranked_actions(workflow_data)
+    return spec
+
+def diff_workflows(deployed, workflow_data):
+    """
+    Compares a new version of the workflow with the last deployed one
+
+    Returns:
+        dict with
+            changed: actions that are new or whose deploy spec changed
+            removed: {platform: [actions]} no longer in the workflow, or no longer
+                     on that platform or server
+            removed_regions: Lambda regions the removed Lambda functions were in
+            removed_servers: {server_name: server_config} of the OpenWhisk servers
+                             the removed OpenWhisk actions were on
+            graph: actions whose successors, ranks or predecessors changed
+            payload: True if the compiled payload changed
+            locator: True if the published payload locator changed
+    """
+    old_graph = compile_payload(deployed)['_compiled']
+    new_graph = compile_payload(workflow_data)['_compiled']
+
+    changed = [
+        action_name for action_name in workflow_data['ActionList']
+        if action_name not in deployed['ActionList']
+        or action_deploy_spec(deployed, action_name) != action_deploy_spec(workflow_data, action_name)
+    ]
+    removed = defaultdict(list)
+    removed_regions = set()
+    removed_servers = {}
+    for action_name in deployed['ActionList']:
+        old_server = deployed['ActionList'][action_name]['FaaSServer']
+        if (action_name not in workflow_data['ActionList']
+                or workflow_data['ActionList'][action_name]['FaaSServer'] != old_server
+                or get_action_platform(workflow_data, action_name) != get_action_platform(deployed, action_name)):
+            # The old function is left behind on its platform; reconcile deletes it
+            platform = get_action_platform(deployed, action_name)
+            removed[platform].append(action_name)
+            if platform == 'lambda':
+                removed_regions.add(get_lambda_region(deployed['ComputeServers'][old_server]))
+            elif platform == 'openwhisk':
+                removed_servers[old_server] = deployed['ComputeServers'][old_server]
+    graph = [
+        action_name for action_name in workflow_data['ActionList']
+        if any(old_graph[part].get(action_name) != new_graph[part][action_name] for part in new_graph)
+    ]
+    return {
+        'changed': changed,
+        'removed': dict(removed),
+        'removed_regions': sorted(removed_regions),
+        'removed_servers': removed_servers,
+        'graph': graph,
+        'payload': payload_version(deployed) != payload_version(workflow_data),
+        'locator': deployed.get('_payload_locator') != workflow_data.get('_payload_locator'),
+    }
+
+def refresh_lambda_environment(lambda_client, prefixed_func_name, environment_vars):
+    """Point an already deployed Lambda function at a new payload"""
+    call_with_retry(
+        'lambda', lambda_client.update_function_configuration,
+        FunctionName=prefixed_func_name,
+        Environment={'Variables': environment_vars}
+    )
+    print(f"Refreshed payload of {prefixed_func_name} on AWS Lambda")
+
+def redeploy_lambda(workflow_data, changed, refresh):
+    """Fully deploy the changed Lambda actions and, if refresh, update the payload of the others"""
+    secret_payload = create_secret_payload(workflow_data)
+    json_prefix = workflow_data.get('WorkflowName', 'default')
+    environment_vars = get_lambda_environment(workflow_data, secret_payload)
+
+    with ThreadPoolExecutor(max_workers=RECONCILE_MAX_WORKERS) as executor:
+        futures = []
+        for (server_name, region), actions in group_lambda_actions(workflow_data).items():
+            server_config = workflow_data['ComputeServers'][server_name]
+            aws_access_key, aws_secret_key, aws_region, role_arn = get_aws_credentials(server_config)
+            lambda_client = get_lambda_client(aws_access_key, aws_secret_key, aws_region)
+            for action_name in actions:
+                if action_name in changed:
+                    futures.append(executor.submit(deploy_lambda_action, workflow_data, lambda_client, aws_region,
+                                                   role_arn, action_name, secret_payload))
+                elif refresh:
+                    futures.append(executor.submit(refresh_lambda_environment, lambda_client,
+                                                   f"{json_prefix}-{action_name}", environment_vars))
+        for future in as_completed(futures):
+            future.result()
+
+def redeploy_changes(workflow_data, changes):
+    """
+    Deploy only what changed since the last deployed version. A platform that
+    lost actions is reconciled as a whole so the removed functions are deleted.
+    """
+    changed = set(changes['changed'])
+    refresh = changes['payload']
+    for platform in sorted(get_workflow_faas_types(workflow_data) | set(changes['removed']) - {None}):
+        platform_actions = {a for a in workflow_data['ActionList'] if get_action_platform(workflow_data, a) == platform}
+        if changes['removed'].get(platform) and platform == 'lambda':
+            # The removed functions may be in a region no Lambda server uses any more
+            print("\nDeploying to lambda...")
+            deploy_to_aws(workflow_data, reconcile=True, extra_regions=changes['removed_regions'])
+        elif changes['removed'].get(platform) and platform == 'openwhisk':
+            # ... or on an OpenWhisk server that is no longer in the workflow
+            print("\nDeploying to openwhisk...")
+            deploy_to_ow(workflow_data, reconcile=True, extra_servers=changes['removed_servers'])
+        elif changes['removed'].get(platform):
+            deploy_to_platform(workflow_data, platform, reconcile=True)
+        elif not refresh and not changed & platform_actions:
+            continue
+        elif platform == 'lambda':
+            print("\nDeploying changes to lambda...")
+            redeploy_lambda(workflow_data, changed, refresh)
+        elif platform == 'githubactions':
+            # The secret and variables carry the payload; files only change with the action
+            print("\nDeploying changes to githubactions...")
+            deploy_to_github(workflow_data, only=changed & platform_actions)
+        elif platform == 'openwhisk':
+            # Actions only carry the payload through their PAYLOAD_LOCATOR parameter
+            if not changes['locator'] and not changed & platform_actions:
+                continue
+            print("\nDeploying changes to openwhisk...")
+            for server_name, action_names in group_ow_actions(workflow_data).items():
+                targets = action_names if changes['locator'] else [a for a in action_names if a in changed]
+                if targets:
+                    deploy_ow_server(workflow_data, server_name, targets)
+
+def deploy_fingerprint(workflow_data):
+    """Short hash of everything a registration deploys: the payload and every action's deploy spec"""
+    specs = {action_name: action_deploy_spec(workflow_data, action_name) for action_name in workflow_data['ActionList']}
+    body = json.dumps({'payload': payload_version(workflow_data), 'actions': specs}, sort_keys=True)
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()[:12]
+
+@contextmanager
+def registration_lease(workflow_data, args):
+    """
+    Hold the workflow's registration lease around a deploy. Yields False when
+    another runner deployed the same version while this one waited, and
+    records the version as deployed when the block finishes without error.
+    """
+    if args.no_lease or get_payload_datastore(workflow_data)[1] is None:
+        yield True
+        return
+
+    lease = RegistrationLease(workflow_data, deploy_fingerprint(workflow_data), args.lease_ttl, args.lease_wait)
+    try:
+        acquired = lease.acquire()
+    except LeaseTimeout as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error taking the registration lease: {str(e)}")
+        sys.exit(1)
+    if not acquired:
+        yield False
+        return
+
+    global _lease
+    _lease = lease
+    try:
+        yield True
+        lease.record_deployed()
+    finally:
+        _lease = None
+        lease.release()
+
+def deploy_actions(workflow_data, action_names):
+    """Deploy just action_names, on whichever platforms they run on"""
+    redeploy_changes(workflow_data, {
+        'changed': list(action_names), 'removed': {}, 'graph': [], 'payload': False, 'locator': False
+    })
+
+def deploy_lazily(workflow_data, started_at, reconcile=False):
+    """
+    Deploy the actions that run on every invocation first, so the workflow is
+    runnable as soon as possible, then the ones only reached through a
+    conditional InvokeNext branch. In reconcile mode the second pass reconciles
+    every platform, which also deletes functions no longer in the workflow.
+    """
+    eager = unconditional_actions(workflow_data)
+    deferred = [action_name for action_name in workflow_data['ActionList'] if action_name not in eager]
+
+    print(f"\nDeploying main path: {', '.join(sorted(eager))}")
+    deploy_actions(workflow_data, eager)
+    print(f"✓ Workflow runnable after {time.time() - started_at:.1f}s")
+
+    if reconcile:
+        for platform in sorted(reconcile_platforms(workflow_data)):
+            deploy_to_platform(workflow_data, platform, reconcile=True)
+    elif deferred:
+        print(f"\nDeploying branch-only actions: {', '.join(deferred)}")
+        deploy_actions(workflow_data, deferred)
+        print(f"✓ Branch-only actions deployed after {time.time() - started_at:.1f}s")
+
+def watch_workflow(args, deployed, digest_cache):
+    """
+    Poll the workflow file and redeploy what changed on every save. Clients,
+    connection pools and the digest cache stay warm between deploys. A version
+    that fails validation or deployment is reported and the watch goes on.
+    """
+    last_mtime = os.stat(args.workflow_file).st_mtime
+    print(f"\nWatching {args.workflow_file} for changes (Ctrl-C to stop)...")
+    try:
+        while True:
+            time.sleep(args.watch_interval)
+            try:
+                mtime = os.stat(args.workflow_file).st_mtime
+            except FileNotFoundError:
+                # Editors that save by renaming briefly remove the file
+                continue
+            if mtime == last_mtime:
+                continue
+            last_mtime = mtime
+
+            started_at = time.time()
+            print(f"\n{args.workflow_file} changed at {time.strftime('%H:%M:%S')}")
+            try:
+                workflow_data = load_workflow(args.workflow_file)
+                prepare_deploy(workflow_data, args, digest_cache)
+                changes = diff_workflows(deployed, workflow_data)
+            except SystemExit:
+                print("✗ Not deploying this version; waiting for the next save")
+                continue
+            if not changes['changed'] and not changes['removed'] and not changes['payload']:
+                print("No changes to deploy")
+                continue
+
+            removed = [a for actions in changes['removed'].values() for a in actions]
+            print(f"Changed actions: {', '.join(changes['changed']) or 'none'}; "
+                  f"removed: {', '.join(removed) or 'none'}; "
+                  f"graph changed for: {', '.join(changes['graph']) or 'none'}; "
+                  f"payload {'changed' if changes['payload'] else 'unchanged'}")
+            status = 'failed'
+            try:
+                with registration_lease(workflow_data, args) as needed:
+                    if needed:
+                        redeploy_changes(workflow_data, changes)
+                status = 'ok'
+                deployed = workflow_data
+                print(f"✓ Redeployed in {time.time() - started_at:.1f}s")
+            except SystemExit:
+                print("✗ Redeploy failed; waiting for the next save")
+            finally:
+                finish_run(workflow_data, started_at, status, args)
+    except KeyboardInterrupt:
+        print("\nStopped watching")
+
+def main():
+    args = parse_arguments()
+    started_at = time.time()
+    workflow_data = load_workflow(args.workflow_file)
+    faas_types = get_workflow_faas_types(workflow_data)
+    print(f"Found FaaS platforms: {', '.join(sorted(faas_types))}")
+
+    # Fail fast on bad credentials before any platform is modified
+    if not args.skip_preflight:
+        run_preflight(workflow_data, args.preflight_timeout)
+
+    digest_cache = DigestCache(ttl=args.digest_cache_ttl)
+    prepare_deploy(workflow_data, args, digest_cache)
+
+    # Deploy to each platform found
+    status = 'failed'
+    try:
+        # One registration of a workflow at a time; a second runner waits for the first
+        with registration_lease(workflow_data, args) as needed:
+            if needed and args.lazy:
+                deploy_lazily(workflow_data, started_at, args.reconcile)
+            elif needed:
+                for platform in (reconcile_platforms(workflow_data) if args.reconcile else faas_types):
+                    deploy_to_platform(workflow_data, platform, args.reconcile)
+        status = 'ok' if needed else 'skipped'
+    finally:
+        finish_run(workflow_data, started_at, status, args)
+
+    if args.watch:
+        watch_workflow(args, workflow_data, digest_cache)
+
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
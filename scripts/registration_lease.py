@@ -0,0 +1,200 @@
+"""
+Per-workflow registration lease kept in the workflow's S3/MinIO DataStore.
+
+Two registrations of the same workflow (e.g. register-prefix-workflow.yml
+dispatched twice) would otherwise redo each other's updates, run into
+ResourceConflictException and write workflow files from stale SHAs.
+Registration first takes FaaSrRegistration/{WorkflowName}/lease.json with a
+conditional write: If-None-Match when the object does not exist yet, If-Match
+on its ETag when taking over a lease that was released or has expired. Exactly
+one runner wins; it renews the lease while it deploys and marks it released
+when it is done.
+
+A runner that finds the lease held waits for it. If the holder was deploying
+the same version and it recorded that version in deployed.json, the waiting
+runner has nothing left to do and skips its deploy. deployed.json is only
+written with If-Match on the ETag read when the lease was taken, so a runner
+that lost its lease cannot overwrite a newer record.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+from cloud_retry import call_with_retry, is_not_found, is_precondition_failed
+from payload_store import get_payload_datastore, get_s3_client
+
+LEASE_PREFIX = "FaaSrRegistration"
+LEASE_TTL = 300
+LEASE_WAIT = 900
+LEASE_POLL_INTERVAL = 5.0
+
+
+class LeaseTimeout(Exception):
+    """Raised when the lease is still held by another runner after the wait limit"""
+
+
+def lease_holder():
+    """Describes this runner: the GitHub Actions run URL in CI, otherwise host and pid"""
+    if os.getenv('GITHUB_RUN_ID') and os.getenv('GITHUB_REPOSITORY'):
+        server = os.getenv('GITHUB_SERVER_URL', 'https://github.com')
+        return f"{server}/{os.getenv('GITHUB_REPOSITORY')}/actions/runs/{os.getenv('GITHUB_RUN_ID')}"
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class RegistrationLease:
+    """
+    Lease on the registration of one workflow version
+
+    Arguments:
+        workflow_data: FaaSr payload dict; the lease lives in its DefaultDataStore
+        version: fingerprint of what is about to be deployed
+        ttl: seconds the lease is valid without being renewed
+        wait: seconds to wait for another runner's lease before giving up
+        s3: S3 client to use instead of creating one (e.g. under moto)
+    """
+
+    def __init__(self, workflow_data, version, ttl=LEASE_TTL, wait=LEASE_WAIT, s3=None):
+        store_name, store_config = get_payload_datastore(workflow_data)
+        workflow_name = workflow_data.get('WorkflowName', 'default')
+        self.bucket = store_config['Bucket']
+        self.lease_key = f"{LEASE_PREFIX}/{workflow_name}/lease.json"
+        self.deployed_key = f"{LEASE_PREFIX}/{workflow_name}/deployed.json"
+        self.version = version
+        self.ttl = ttl
+        self.wait = wait
+        self.s3 = s3 or get_s3_client(store_name, store_config)
+        self.owner = uuid.uuid4().hex
+        self.holder = lease_holder()
+        self.lost = False
+        self._etag = None
+        self._deployed_etag = None
+        self._stop = threading.Event()
+        self._renewer = None
+
+    def _get(self, key):
+        """Returns (document, ETag), or (None, None) if the object does not exist"""
+        try:
+            response = call_with_retry('s3', self.s3.get_object, Bucket=self.bucket, Key=key)
+        except Exception as e:
+            if is_not_found(e):
+                return None, None
+            raise
+        return json.loads(response['Body'].read()), response['ETag']
+
+    def _put(self, key, document, etag=None):
+        """Conditional write: create-only without etag, compare-and-swap with it. Returns the new ETag."""
+        condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+        response = call_with_retry(
+            's3', self.s3.put_object, Bucket=self.bucket, Key=key,
+            Body=json.dumps(document).encode('utf-8'), ContentType='application/json', **condition
+        )
+        return response['ETag']
+
+    def _lease_document(self, released=False):
+        return {
+            'Owner': self.owner,
+            'Holder': self.holder,
+            'Version': self.version,
+            'ExpiresAt': time.time() + self.ttl,
+            'Released': released,
+        }
+
+    def _try_take(self):
+        """
+        One attempt at taking the lease
+
+        Returns:
+            (bool, dict) -- whether it was taken, and the lease document that blocked it
+        """
+        current, etag = self._get(self.lease_key)
+        if current is not None and not current.get('Released') and current.get('ExpiresAt', 0) > time.time():
+            return False, current
+        try:
+            self._etag = self._put(self.lease_key, self._lease_document(), etag)
+        except Exception as e:
+            if not is_precondition_failed(e):
+                raise
+            # Another runner wrote the lease between our read and write
+            current, _ = self._get(self.lease_key)
+            return False, current
+        if current is not None and not current.get('Released'):
+            print(f"Took over the expired registration lease of {current.get('Holder')}")
+        return True, None
+
+    def acquire(self):
+        """
+        Take the lease, waiting while another runner holds it
+
+        Returns:
+            bool: False if another runner deployed this same version while we
+            waited (the lease is then not held and there is nothing to do)
+
+        Raises:
+            LeaseTimeout: if the lease is still held after self.wait seconds
+        """
+        deadline = time.time() + self.wait
+        waited_on = None
+        while True:
+            taken, blocker = self._try_take()
+            if taken:
+                break
+            if blocker and waited_on is None:
+                print(f"Registration of this workflow is in progress by {blocker.get('Holder')} "
+                      f"(version {blocker.get('Version')}); waiting up to {self.wait:.0f}s")
+            if blocker:
+                waited_on = blocker
+            if time.time() > deadline:
+                holder = waited_on.get('Holder') if waited_on else 'another runner'
+                raise LeaseTimeout(f"registration lease still held by {holder} after {self.wait:.0f}s")
+            time.sleep(LEASE_POLL_INTERVAL)
+
+        deployed, self._deployed_etag = self._get(self.deployed_key)
+        if waited_on and waited_on.get('Version') == self.version and deployed \
+                and deployed.get('Version') == self.version:
+            print(f"Version {self.version} was deployed by {deployed.get('Holder')} while waiting; skipping")
+            self.release()
+            return False
+
+        self._renewer = threading.Thread(target=self._renew_loop, daemon=True)
+        self._renewer.start()
+        return True
+
+    def _renew_loop(self):
+        while not self._stop.wait(self.ttl / 3):
+            try:
+                self._etag = self._put(self.lease_key, self._lease_document(), self._etag)
+            except Exception as e:
+                if is_precondition_failed(e):
+                    self.lost = True
+                    print("Warning: the registration lease was taken over by another runner")
+                    return
+                print(f"Warning: could not renew the registration lease: {e}")
+
+    def record_deployed(self):
+        """Record this version as deployed, unless another runner recorded one since we took the lease"""
+        document = {'Version': self.version, 'Holder': self.holder, 'DeployedAt': time.time()}
+        try:
+            self._deployed_etag = self._put(self.deployed_key, document, self._deployed_etag)
+        except Exception as e:
+            if not is_precondition_failed(e):
+                raise
+            self.lost = True
+            print("Warning: another runner recorded a deployment while this one held an expired lease")
+
+    def release(self):
+        """Stop renewing and mark the lease released, if we still hold it"""
+        self._stop.set()
+        if self._renewer:
+            self._renewer.join()
+        if self.lost or self._etag is None:
+            return
+        try:
+            self._put(self.lease_key, self._lease_document(released=True), self._etag)
+        except Exception as e:
+            # An unreleased lease simply expires after ttl seconds
+            print(f"Warning: could not release the registration lease: {e}")
+        self._etag = None
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Deployment and run history kept in a local SQLite database.
+
+register_workflow.py and invoke_workflow.py append one row per run, together
+with what was measured during it:
+
+    deploys      -- per action: platform, function name, image, digest, duration, status
+    payloads     -- sizes in bytes of the compiled payload and SECRET_PAYLOAD
+    api_calls    -- per platform: calls, retries, throttles and failures
+    invocations  -- per action instance: queue delay, cold start and execution time
+
+Runs are keyed by workflow name and version (the hash of the compiled payload),
+so trends can be followed across versions. The database lives at
+$FAASR_HISTORY_DB, or history.db in $FAASR_CACHE_DIR (~/.cache/faasr).
+
+Run as a script to query it:
+
+    python scripts/run_history.py runs --workflow project1
+    python scripts/run_history.py deploys --platform lambda --last 30 --percentile 95
+    python scripts/run_history.py invocations --workflow project1 --metric cold_start
+"""
+
+import argparse
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    workflow TEXT NOT NULL,
+    version TEXT,
+    started_at REAL NOT NULL,
+    duration REAL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_workflow ON runs (kind, workflow, started_at);
+
+CREATE TABLE IF NOT EXISTS deploys (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    action TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    function_name TEXT NOT NULL,
+    image TEXT,
+    digest TEXT,
+    duration REAL NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS deploys_by_run ON deploys (run_id);
+
+CREATE TABLE IF NOT EXISTS payloads (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    name TEXT NOT NULL,
+    bytes INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS api_calls (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    platform TEXT NOT NULL,
+    calls INTEGER NOT NULL,
+    retries INTEGER NOT NULL,
+    throttled INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    backoff_s REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS invocations (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    action TEXT NOT NULL,
+    instance TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    queue_delay REAL,
+    cold_start REAL,
+    execution REAL,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS invocations_by_run ON invocations (run_id);
+"""
+
+INVOCATION_METRICS = ('queue_delay', 'cold_start', 'execution')
+
+# Measurements since the last recorded run, written out by HistoryStore.record_run
+_deploys = []
+_payload_sizes = {}
+_records_lock = threading.Lock()
+
+
+def default_history_path():
+    return os.getenv('FAASR_HISTORY_DB') or os.path.join(
+        os.getenv('FAASR_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'faasr')),
+        'history.db'
+    )
+
+
+@contextmanager
+def track_deploy(action_name, platform, function_name, image=None):
+    """
+    Times the deployment of one action. A deployer that gives up with sys.exit
+    is recorded as failed before the exit propagates.
+    """
+    start = time.time()
+    status = 'failed'
+    try:
+        yield
+        status = 'ok'
+    finally:
+        with _records_lock:
+            _deploys.append({
+                'action': action_name,
+                'platform': platform,
+                'function_name': function_name,
+                'image': image,
+                'digest': image.split('@', 1)[1] if image and '@' in image else None,
+                'duration': time.time() - start,
+                'status': status,
+            })
+
+
+def record_payload_size(name, size):
+    """Remember the size in bytes of a payload (e.g. 'compiled', 'secret') for this run"""
+    with _records_lock:
+        _payload_sizes[name] = size
+
+
+def reset_records():
+    """Drop the deploys and payload sizes recorded so far, e.g. when history is off"""
+    with _records_lock:
+        _deploys.clear()
+        _payload_sizes.clear()
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class HistoryStore:
+    """SQLite-backed history of registrations and invocations"""
+
+    def __init__(self, path=None):
+        self.path = path or default_history_path()
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def record_run(self, kind, workflow_name, version, started_at, status, api_stats=None, timeline=None):
+        """
+        Write one run with the deploys and payload sizes recorded since the last run,
+        the cloud_retry counters and, for invocations, the RunTracker timeline.
+
+        Returns:
+            int: the run id
+        """
+        with _records_lock:
+            deploys = list(_deploys)
+            payload_sizes = dict(_payload_sizes)
+            _deploys.clear()
+            _payload_sizes.clear()
+
+        with self.conn:
+            run_id = self.conn.execute(
+                "INSERT INTO runs (kind, workflow, version, started_at, duration, status) VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, workflow_name, version, started_at, time.time() - started_at, status)
+            ).lastrowid
+            self.conn.executemany(
+                "INSERT INTO deploys (run_id, action, platform, function_name, image, digest, duration, status) "
+                "VALUES (:run_id, :action, :platform, :function_name, :image, :digest, :duration, :status)",
+                [dict(d, run_id=run_id) for d in deploys]
+            )
+            self.conn.executemany(
+                "INSERT INTO payloads (run_id, name, bytes) VALUES (?, ?, ?)",
+                [(run_id, name, size) for name, size in payload_sizes.items()]
+            )
+            self.conn.executemany(
+                "INSERT INTO api_calls (run_id, platform, calls, retries, throttled, failures, backoff_s) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (run_id, platform, int(c.get('calls', 0)), int(c.get('retries', 0)),
+                     int(c.get('throttle', 0)), int(c.get('failures', 0)), c.get('backoff_s', 0.0))
+                    for platform, c in (api_stats or {}).items()
+                ]
+            )
+            self.conn.executemany(
+                "INSERT INTO invocations (run_id, action, instance, platform, queue_delay, cold_start, execution, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (run_id, r['action'], r['instance'], r['platform'], r['queue_delay'],
+                     r['cold_start'], r['execution'], r['status'])
+                    for r in timeline or []
+                ]
+            )
+        return run_id
+
+    def _last_run_ids(self, kind, workflow_name, last):
+        query = "SELECT id FROM runs WHERE kind = ?"
+        params = [kind]
+        if workflow_name:
+            query += " AND workflow = ?"
+            params.append(workflow_name)
+        query += " ORDER BY started_at DESC LIMIT ?"
+        params.append(last)
+        return [row['id'] for row in self.conn.execute(query, params)]
+
+    def recent_runs(self, kind=None, workflow_name=None, last=20):
+        """The last runs, newest first, with payload sizes and API call totals"""
+        query = """
+            SELECT r.*,
+                   (SELECT group_concat(name || '=' || bytes, ' ') FROM payloads p WHERE p.run_id = r.id) AS payloads,
+                   (SELECT sum(calls) FROM api_calls a WHERE a.run_id = r.id) AS calls,
+                   (SELECT sum(retries) FROM api_calls a WHERE a.run_id = r.id) AS retries
+            FROM runs r WHERE 1 = 1
+        """
+        params = []
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        if workflow_name:
+            query += " AND workflow = ?"
+            params.append(workflow_name)
+        query += " ORDER BY started_at DESC LIMIT ?"
+        params.append(last)
+        return self.conn.execute(query, params).fetchall()
+
+    def deploy_durations(self, workflow_name=None, platform=None, last=30):
+        """
+        Deploy durations of successful deploys over the last registrations
+
+        Returns:
+            dict: {function_name: [(platform, duration), ...] oldest first}
+        """
+        run_ids = self._last_run_ids('deploy', workflow_name, last)
+        if not run_ids:
+            return {}
+        query = (f"SELECT d.* FROM deploys d JOIN runs r ON r.id = d.run_id "
+                 f"WHERE d.run_id IN ({','.join('?' * len(run_ids))}) AND d.status = 'ok'")
+        params = list(run_ids)
+        if platform:
+            query += " AND d.platform = ?"
+            params.append(platform)
+        series = {}
+        for row in self.conn.execute(query + " ORDER BY r.started_at", params):
+            series.setdefault(row['function_name'], []).append((row['platform'], row['duration']))
+        return series
+
+    def invocation_latencies(self, workflow_name=None, platform=None, metric='execution', last=30):
+        """
+        One latency metric of every action over the last invocations
+
+        Returns:
+            dict: {action: [(platform, seconds), ...] oldest first}
+        """
+        if metric not in INVOCATION_METRICS:
+            raise ValueError(f"metric must be one of {', '.join(INVOCATION_METRICS)}")
+        run_ids = self._last_run_ids('invoke', workflow_name, last)
+        if not run_ids:
+            return {}
+        query = (f"SELECT i.action, i.platform, i.{metric} AS value FROM invocations i JOIN runs r ON r.id = i.run_id "
+                 f"WHERE i.run_id IN ({','.join('?' * len(run_ids))}) AND i.{metric} IS NOT NULL")
+        params = list(run_ids)
+        if platform:
+            query += " AND i.platform = ?"
+            params.append(platform)
+        series = {}
+        for row in self.conn.execute(query + " ORDER BY r.started_at", params):
+            series.setdefault(row['action'], []).append((row['platform'], row['value']))
+        return series
+
+
+def print_trends(series, pct, label):
+    """
+    Prints count, p50, the requested percentile and the latest value per name.
+    The latest value is flagged when it is above that percentile of the earlier ones.
+    """
+    if not series:
+        print("No history recorded yet")
+        return
+    print(f"{label:<40} {'Platform':<14} {'Runs':>5} {'p50 (s)':>9} {f'p{pct:g} (s)':>9} {'Last (s)':>9}")
+    for name, points in sorted(series.items()):
+        values = [value for _, value in points]
+        earlier = values[:-1]
+        flag = "  ▲ regression" if earlier and values[-1] > percentile(earlier, pct) else ""
+        print(f"{name:<40} {points[-1][0]:<14} {len(values):>5} {percentile(values, 50):>9.2f} "
+              f"{percentile(values, pct):>9.2f} {values[-1]:>9.2f}{flag}")
+
+
+def print_runs(rows):
+    if not rows:
+        print("No history recorded yet")
+        return
+    print(f"{'Id':>5}  {'Started (UTC)':<19} {'Kind':<7} {'Workflow':<20} {'Version':<12} "
+          f"{'Time (s)':>9} {'Calls':>6} {'Retries':>7}  Status  Payloads")
+    for row in rows:
+        started = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(row['started_at']))
+        print(f"{row['id']:>5}  {started:<19} {row['kind']:<7} {row['workflow']:<20} {(row['version'] or '-'):<12} "
+              f"{row['duration']:>9.1f} {row['calls'] or 0:>6} {row['retries'] or 0:>7}  {row['status']:<7} "
+              f"{row['payloads'] or ''}")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Query the FaaSr deployment and run history')
+    parser.add_argument('--db', default=None,
+                      help='History database (default: $FAASR_HISTORY_DB or ~/.cache/faasr/history.db)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    runs = subparsers.add_parser('runs', help='List recent registrations and invocations')
+    runs.add_argument('--kind', choices=['deploy', 'invoke'],
+                      help='Only list registrations or invocations')
+
+    deploys = subparsers.add_parser('deploys', help='Deploy duration trends per function')
+    invocations = subparsers.add_parser('invocations', help='Invocation latency trends per action')
+    invocations.add_argument('--metric', choices=INVOCATION_METRICS, default='execution',
+                      help='Latency to report')
+
+    for sub in (runs, deploys, invocations):
+        sub.add_argument('--workflow',
+                      help='Only include this WorkflowName')
+        sub.add_argument('--last', type=int, default=30,
+                      help='Number of most recent runs to include')
+    for sub in (deploys, invocations):
+        sub.add_argument('--platform', choices=['lambda', 'githubactions', 'openwhisk'],
+                      help='Only include this platform')
+        sub.add_argument('--percentile', type=float, default=95,
+                      help='Percentile to report next to the median')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    path = args.db or default_history_path()
+    if not os.path.exists(path):
+        print(f"Error: no history database at {path}")
+        sys.exit(1)
+
+    store = HistoryStore(path)
+    try:
+        if args.command == 'runs':
+            print_runs(store.recent_runs(args.kind, args.workflow, args.last))
+        elif args.command == 'deploys':
+            print_trends(store.deploy_durations(args.workflow, args.platform, args.last),
+                         args.percentile, 'Function')
+        else:
+            print_trends(store.invocation_latencies(args.workflow, args.platform, args.metric, args.last),
+                         args.percentile, 'Action')
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Run a FaaSr workflow end to end on the local machine, without any cloud.
+
+The workflow is validated with check_dag and scheduled on a process pool using
+the same adjacency/rank logic: a ranked successor such as func(3) fans out to
+func.1 .. func.3, and an action only starts once every predecessor that is
+going to run has finished (fan-in). Conditional InvokeNext branches follow the
+boolean an action returns, or the outcome given with --branch.
+
+Each action runs the Python function FunctionName from <functions-dir>/<FunctionName>.py,
+called with its Arguments, with a local directory standing in for the DataStore
+as its working directory. Actions without a local implementation are simulated.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from workflow_graph import build_adjacency_graph, check_dag, extract_rank, predecessors_list, ranked_predecessors
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Run a FaaSr workflow locally on a process pool')
+    parser.add_argument('--workflow-file', required=True,
+                      help='Path to the workflow JSON file')
+    parser.add_argument('--functions-dir', default='functions',
+                      help='Directory holding <FunctionName>.py implementations')
+    parser.add_argument('--datastore-dir', default='faasr-local-datastore',
+                      help='Local directory standing in for the DataStore')
+    parser.add_argument('--branch', action='append', default=[], metavar='ACTION=True|False',
+                      help='Outcome of a conditional action (repeatable); overrides its return value')
+    parser.add_argument('--simulate-seconds', type=float, default=0.0,
+                      help='Sleep time for actions without a local implementation')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                      help='Number of worker processes')
+    return parser.parse_args()
+
+
+def read_workflow_file(file_path):
+    try:
+        with open(file_path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"Error: Workflow file {file_path} not found")
+        sys.exit(1)
+    except json.JSONDecodeError:
+        print(f"Error: Invalid JSON in workflow file {file_path}")
+        sys.exit(1)
+
+
+def parse_branch_outcomes(branch_args):
+    """Turns ["delete=False", ...] into {"delete": False, ...}"""
+    outcomes = {}
+    for arg in branch_args:
+        action_name, _, value = arg.partition('=')
+        if value.lower() not in ('true', 'false'):
+            print(f"Error: --branch expects ACTION=True|False, got '{arg}'")
+            sys.exit(1)
+        outcomes[action_name] = value.lower() == 'true'
+    return outcomes
+
+
+def successors_for(action_data, outcome):
+    """
+    Returns the (action name, rank) pairs an action invokes, following only the
+    conditional branches that match its outcome
+    """
+    invoke_next = action_data.get('InvokeNext', [])
+    if isinstance(invoke_next, str):
+        invoke_next = [invoke_next]
+    taken = []
+    for child in invoke_next:
+        if isinstance(child, dict):
+            for condition, branch in child.items():
+                if str(condition).lower() == str(outcome).lower():
+                    taken.extend(extract_rank(action) for action in branch)
+        else:
+            taken.append(extract_rank(child))
+    return taken
+
+
+def execute_action(function_name, arguments, rank, functions_dir, datastore_dir, simulate_seconds):
+    """
+    Runs one action instance in a worker process
+
+    Returns:
+        (result, start, end, simulated)
+    """
+    start = time.time()
+    os.makedirs(datastore_dir, exist_ok=True)
+    os.chdir(datastore_dir)
+    os.environ['FAASR_FUNCTION_RANK'] = str(rank)
+
+    module_path = os.path.join(functions_dir, f"{function_name}.py")
+    if not os.path.exists(module_path):
+        time.sleep(simulate_seconds)
+        return None, start, time.time(), True
+
+    spec = importlib.util.spec_from_file_location(function_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    result = getattr(module, function_name)(**arguments)
+    return result, start, time.time(), False
+
+
+def run_workflow(workflow_data, functions_dir, datastore_dir, branch_outcomes, simulate_seconds, workers):
+    """
+    Schedules the workflow on a process pool
+
+    Returns:
+        (timings, skipped, makespan) -- timings maps each instance to a dict with
+        ready/start/end offsets in seconds from the start of the run
+    """
+    action_list = workflow_data['ActionList']
+    adj_graph, ranks = build_adjacency_graph(workflow_data)
+    pre = predecessors_list(adj_graph)
+
+    # Expand ranked actions into one instance per rank
+    instances = {
+        action: [f"{action}.{i}" for i in range(1, ranks[action] + 1)] if ranks.get(action, 0) > 1 else [action]
+        for action in action_list
+    }
+    preds = {action: ranked_predecessors(pre, ranks, action) for action in action_list}
+
+    functions_dir = os.path.abspath(functions_dir)
+    datastore_dir = os.path.abspath(datastore_dir)
+
+    invoked = {workflow_data['FunctionInvoke']}
+    resolved = set()
+    scheduled = set()
+    skipped = []
+    timings = {}
+    running = {}
+    run_start = time.time()
+
+    def schedule(executor, action):
+        scheduled.add(action)
+        for i, instance in enumerate(instances[action], start=1):
+            action_data = action_list[action]
+            running[executor.submit(
+                execute_action, action_data['FunctionName'], action_data.get('Arguments', {}),
+                i, functions_dir, datastore_dir, simulate_seconds
+            )] = (action, instance)
+            timings[instance] = {'ready': time.time() - run_start}
+
+    def settle(executor, action):
+        # Start or skip an action once all of its predecessors are resolved
+        if action in scheduled or not all(p in resolved for p in preds[action]):
+            return
+        if action in invoked:
+            schedule(executor, action)
+        else:
+            # Never invoked by any predecessor: this branch was not taken
+            scheduled.add(action)
+            skipped.append(action)
+            resolved.update(instances[action])
+            for child in adj_graph[action]:
+                settle(executor, child)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        schedule(executor, workflow_data['FunctionInvoke'])
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                action, instance = running.pop(future)
+                try:
+                    result, start, end, simulated = future.result()
+                except Exception as e:
+                    print(f"✗ {instance} failed: {e}")
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    sys.exit(1)
+                timings[instance].update(start=start - run_start, end=end - run_start, simulated=simulated)
+
+                outcome = branch_outcomes.get(action, result if isinstance(result, bool) else True)
+                for child, _ in successors_for(action_list[action], outcome):
+                    invoked.add(child)
+                resolved.add(instance)
+                for child in adj_graph[action]:
+                    settle(executor, child)
+
+    return timings, skipped, time.time() - run_start
+
+
+def print_report(timings, skipped, makespan):
+    print(f"\n{'Action':<30} {'Queued (s)':>10} {'Run (s)':>10} {'End (s)':>10}")
+    for instance, t in sorted(timings.items(), key=lambda item: item[1]['start']):
+        note = "  (simulated)" if t['simulated'] else ""
+        print(f"{instance:<30} {t['start'] - t['ready']:>10.3f} {t['end'] - t['start']:>10.3f} {t['end']:>10.3f}{note}")
+    for action in skipped:
+        print(f"{action:<30} {'skipped (branch not taken)':>32}")
+    print(f"\nTotal makespan: {makespan:.3f}s")
+
+
+def main():
+    args = parse_arguments()
+    workflow_data = read_workflow_file(args.workflow_file)
+
+    # Validate workflow for cycles and unreachable states
+    print("Validating workflow for cycles and unreachable states...")
+    try:
+        check_dag(workflow_data)
+        print("✓ Workflow validation passed - no cycles or unreachable states found")
+    except SystemExit:
+        print("✗ Workflow validation failed - check logs for details")
+        sys.exit(1)
+
+    timings, skipped, makespan = run_workflow(
+        workflow_data,
+        args.functions_dir,
+        args.datastore_dir,
+        parse_branch_outcomes(args.branch),
+        args.simulate_seconds,
+        args.workers
+    )
+    print_report(timings, skipped, makespan)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,362 @@
+"""
+Follow a triggered FaaSr workflow run across platforms and report its timeline.
+
+Each poll makes a few batched list calls, however many actions the workflow has:
+
+    GitHub Actions -- one workflow-runs listing per repository
+    Lambda         -- one log group listing and one Logs Insights query over the
+                      REPORT lines of every function, per region
+    OpenWhisk      -- one activations listing per server
+
+The poll interval backs off while nothing changes and drops back as soon as
+something does. When every action has finished (or the run goes quiet, or the
+timeout expires) a per-action timeline is printed with queue delay, cold start,
+execution time and the total workflow latency.
+"""
+
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import boto3
+import requests
+
+from cloud_retry import call_with_retry, is_not_found
+from platform_config import get_action_platform, get_lambda_region, get_openwhisk_credentials, get_ow_api_url, get_ow_auth
+from workflow_graph import build_adjacency_graph, predecessors_list
+
+POLL_MIN_INTERVAL = 2.0
+POLL_MAX_INTERVAL = 30.0
+POLL_BACKOFF = 1.5
+INSIGHTS_TIMEOUT = 30
+OW_ACTIVATIONS_LIMIT = 200
+
+LAMBDA_REPORT_QUERY = (
+    'fields @timestamp, @log, @requestId, @duration, @initDuration '
+    '| filter @type = "REPORT"'
+)
+
+
+def _parse_time(value):
+    """Parses GitHub (ISO 8601) and Logs Insights ('YYYY-MM-DD HH:MM:SS.fff', UTC) timestamps"""
+    if value is None:
+        return None
+    if 'T' in value:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    return datetime.strptime(value, '%Y-%m-%d %H:%M:%S.%f').replace(tzinfo=timezone.utc).timestamp()
+
+
+class RunTracker:
+    """
+    Tracks the actions of one workflow run from trigger_time onwards.
+
+    Observations are kept in self.records, keyed by a platform-unique id (GitHub
+    run id, Lambda request id, OpenWhisk activation id), each a dict with
+    action, platform, ready, start, end, cold_start and status.
+    """
+
+    def __init__(self, workflow_data, trigger_time):
+        self.workflow_data = workflow_data
+        self.trigger_time = trigger_time
+        self.prefix = workflow_data.get('WorkflowName', 'default')
+        self.records = {}
+        self._jobs_fetched = set()
+
+        adj_graph, ranks = build_adjacency_graph(workflow_data)
+        self.predecessors = predecessors_list(adj_graph)
+        self.expected = {action: max(ranks.get(action, 0), 1) for action in workflow_data['ActionList']}
+
+        # Group actions by the server they run on
+        self.github_repos = defaultdict(list)
+        self.lambda_regions = defaultdict(list)
+        self.ow_servers = defaultdict(list)
+        for action_name, action_data in workflow_data['ActionList'].items():
+            server_name = action_data['FaaSServer']
+            server_config = workflow_data['ComputeServers'][server_name]
+            platform = get_action_platform(workflow_data, action_name)
+            if platform == 'githubactions':
+                repo = f"{server_config['UserName']}/{server_config['ActionRepoName']}"
+                self.github_repos[repo].append(action_name)
+            elif platform == 'lambda':
+                self.lambda_regions[get_lambda_region(server_config)].append(action_name)
+            elif platform == 'openwhisk':
+                self.ow_servers[server_name].append(action_name)
+
+    # -- GitHub Actions ------------------------------------------------------
+
+    def _github_get(self, url, **params):
+        headers = {"Accept": "application/vnd.github+json"}
+        if os.getenv('GITHUB_TOKEN'):
+            headers["Authorization"] = f"Bearer {os.getenv('GITHUB_TOKEN')}"
+
+        def get():
+            r = requests.get(url, headers=headers, params=params)
+            r.raise_for_status()
+            return r.json()
+        return call_with_retry('github', get)
+
+    def _poll_github(self, repo, actions):
+        names = {f"{self.prefix}-{action}": action for action in actions}
+        since = datetime.fromtimestamp(self.trigger_time - 5, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        runs = self._github_get(
+            f"https://api.github.com/repos/{repo}/actions/runs",
+            event='workflow_dispatch', created=f">={since}", per_page=100
+        )['workflow_runs']
+
+        changed = False
+        for run in runs:
+            if run['name'] not in names:
+                continue
+            record = {
+                'action': names[run['name']],
+                'platform': 'githubactions',
+                'ready': _parse_time(run['created_at']),
+                'start': _parse_time(run.get('run_started_at')),
+                'end': _parse_time(run['updated_at']) if run['status'] == 'completed' else None,
+                'cold_start': None,
+                'status': run['conclusion'] or run['status'],
+            }
+            key = f"gh-{run['id']}"
+
+            # Container start-up is the cold start; fetch the job steps once per finished run
+            if record['end'] is not None and key not in self._jobs_fetched:
+                self._jobs_fetched.add(key)
+                for job in self._github_get(run['jobs_url'])['jobs']:
+                    for step in job.get('steps', []):
+                        if step['name'] == 'Initialize containers' and step.get('completed_at'):
+                            record['cold_start'] = _parse_time(step['completed_at']) - _parse_time(step['started_at'])
+            elif key in self.records:
+                record['cold_start'] = self.records[key]['cold_start']
+
+            if self.records.get(key) != record:
+                self.records[key] = record
+                changed = True
+        return changed
+
+    # -- Lambda ----------------------------------------------------------------
+
+    def _poll_lambda(self, region, actions):
+        logs = boto3.client(
+            'logs',
+            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+            region_name=region
+        )
+        wanted = {f"/aws/lambda/{self.prefix}-{action}": action for action in actions}
+        groups = call_with_retry('lambda', logs.describe_log_groups,
+                                 logGroupNamePrefix=f"/aws/lambda/{self.prefix}-")['logGroups']
+        groups = [g['logGroupName'] for g in groups if g['logGroupName'] in wanted]
+        if not groups:
+            return False
+
+        query_id = call_with_retry(
+            'lambda', logs.start_query,
+            logGroupNames=groups,
+            startTime=int(self.trigger_time) - 60,
+            endTime=int(time.time()) + 60,
+            queryString=LAMBDA_REPORT_QUERY,
+            limit=10000
+        )['queryId']
+        deadline = time.time() + INSIGHTS_TIMEOUT
+        while True:
+            result = call_with_retry('lambda', logs.get_query_results, queryId=query_id)
+            if result['status'] not in ('Scheduled', 'Running') or time.time() > deadline:
+                break
+            time.sleep(1)
+
+        changed = False
+        for row in result.get('results', []):
+            fields = {f['field']: f['value'] for f in row}
+            key = f"lambda-{fields['@requestId']}"
+            if key in self.records:
+                continue
+            group = fields['@log'].split(':', 1)[-1]
+            duration = float(fields['@duration']) / 1000
+            cold_start = float(fields['@initDuration']) / 1000 if fields.get('@initDuration') else None
+            end = _parse_time(fields['@timestamp'])
+            self.records[key] = {
+                'action': wanted.get(group, group),
+                'platform': 'lambda',
+                'ready': None,
+                'start': end - duration - (cold_start or 0),
+                'end': end,
+                'cold_start': cold_start,
+                'status': 'completed',
+            }
+            changed = True
+        return changed
+
+    # -- OpenWhisk -------------------------------------------------------------
+
+    def _poll_openwhisk(self, server_name, actions):
+        api_host, namespace, ssl, ow_api_key = get_openwhisk_credentials(
+            server_name, self.workflow_data['ComputeServers'][server_name]
+        )
+        names = {f"{self.prefix}-{action}": action for action in actions}
+
+        def get():
+            # Always use insecure mode to bypass certificate issues, as with the wsk CLI
+            r = requests.get(
+                f"{get_ow_api_url(api_host)}/api/v1/namespaces/{namespace}/activations",
+                params={'since': int(self.trigger_time * 1000), 'limit': OW_ACTIVATIONS_LIMIT, 'docs': 'true'},
+                auth=get_ow_auth(ow_api_key),
+                verify=False
+            )
+            r.raise_for_status()
+            return r.json()
+
+        changed = False
+        for activation in call_with_retry('openwhisk', get):
+            if activation['name'] not in names:
+                continue
+            key = f"ow-{activation['activationId']}"
+            if key in self.records or not activation.get('end'):
+                continue
+            annotations = {a['key']: a['value'] for a in activation.get('annotations', [])}
+            start = activation['start'] / 1000
+            wait_time = annotations.get('waitTime')
+            init_time = annotations.get('initTime')
+            self.records[key] = {
+                'action': names[activation['name']],
+                'platform': 'openwhisk',
+                'ready': start - wait_time / 1000 if wait_time is not None else None,
+                'start': start,
+                'end': activation['end'] / 1000,
+                'cold_start': init_time / 1000 if init_time is not None else None,
+                'status': 'success' if activation.get('response', {}).get('success') else 'failure',
+            }
+            changed = True
+        return changed
+
+    # -- Polling -----------------------------------------------------------------
+
+    def poll(self):
+        """One batched pass over every platform. Returns True if anything changed."""
+        changed = False
+        for repo, actions in self.github_repos.items():
+            changed |= self._poll_github(repo, actions)
+        for region, actions in self.lambda_regions.items():
+            try:
+                changed |= self._poll_lambda(region, actions)
+            except Exception as e:
+                if not is_not_found(e):
+                    raise
+        for server_name, actions in self.ow_servers.items():
+            changed |= self._poll_openwhisk(server_name, actions)
+        return changed
+
+    def completed_runs(self):
+        """
+        Returns {action: [finished records that did the action's work]}.
+
+        Every predecessor instance triggers its successors, so an action with
+        several of them (fan-in, e.g. after a ranked action) is started once per
+        predecessor, and each start but the last exits straight away. Only runs
+        ending after all predecessor instances have ended count; an action whose
+        predecessors have not all finished has none yet.
+        """
+        finished = defaultdict(list)
+        for record in self.records.values():
+            if record['end'] is not None:
+                finished[record['action']].append(record)
+
+        completed = {}
+
+        def resolve(action):
+            if action in completed:
+                return completed[action]
+            runs = sorted(finished[action], key=lambda r: r['end'])
+            preds = self.predecessors.get(action, [])
+            if sum(self.expected[pred] for pred in preds) > 1:
+                pred_ends = []
+                for pred in preds:
+                    pred_runs = resolve(pred)
+                    if len(pred_runs) < self.expected[pred]:
+                        runs = []
+                        break
+                    pred_ends.append(pred_runs[self.expected[pred] - 1]['end'])
+                else:
+                    runs = [r for r in runs if r['end'] > max(pred_ends)]
+            completed[action] = runs
+            return runs
+
+        for action in self.expected:
+            resolve(action)
+        return completed
+
+    def finished(self):
+        """True once every action instance has been seen finishing its work"""
+        completed = self.completed_runs()
+        return all(len(completed[action]) >= count for action, count in self.expected.items())
+
+    def running(self):
+        return any(record['end'] is None for record in self.records.values())
+
+    def wait(self, timeout, settle_seconds):
+        """
+        Poll until every action has finished, until nothing has run or changed for
+        settle_seconds (e.g. conditional branches that were not taken), or until
+        timeout seconds after the trigger
+        """
+        interval = POLL_MIN_INTERVAL
+        last_change = time.time()
+        while True:
+            if self.poll():
+                last_change = time.time()
+                interval = POLL_MIN_INTERVAL
+            else:
+                interval = min(POLL_MAX_INTERVAL, interval * POLL_BACKOFF)
+
+            if self.finished():
+                return True
+            if self.records and not self.running() and time.time() - last_change > settle_seconds:
+                return False
+            if time.time() - self.trigger_time > timeout:
+                print(f"Timed out after {timeout}s waiting for the workflow to finish")
+                return False
+            time.sleep(interval)
+
+    # -- Report ------------------------------------------------------------------
+
+    def timeline(self):
+        """
+        Returns the finished action instances in start order, each record extended
+        with instance, queue_delay and execution (seconds). Fan-in runs that
+        exited early (see completed_runs) are left out.
+        """
+        finished = sorted((r for runs in self.completed_runs().values() for r in runs), key=lambda r: r['start'])
+        ends = defaultdict(list)
+        rank_counter = defaultdict(int)
+        timeline = []
+        for record in finished:
+            record = dict(record)
+            action = record['action']
+            # Lambda does not report when it was invoked: use the latest predecessor end
+            if record['ready'] is None:
+                pred_ends = [end for pred in self.predecessors.get(action, []) for end in ends[pred]]
+                record['ready'] = max(pred_ends) if pred_ends else self.trigger_time
+            rank_counter[action] += 1
+            record['instance'] = f"{action}.{rank_counter[action]}" if self.expected[action] > 1 else action
+            record['queue_delay'] = max(0.0, record['start'] - record['ready'])
+            record['execution'] = max(0.0, record['end'] - record['start'] - (record['cold_start'] or 0))
+            ends[action].append(record['end'])
+            timeline.append(record)
+        return timeline
+
+    def print_report(self):
+        timeline = self.timeline()
+        print(f"\n{'Action':<30} {'Platform':<14} {'Queue (s)':>10} {'Cold (s)':>10} {'Exec (s)':>10}  Status")
+        for r in timeline:
+            cold = f"{r['cold_start']:.2f}" if r['cold_start'] is not None else "-"
+            print(f"{r['instance']:<30} {r['platform']:<14} {r['queue_delay']:>10.2f} {cold:>10} "
+                  f"{r['execution']:>10.2f}  {r['status']}")
+
+        seen = {r['action'] for r in timeline}
+        for action in self.workflow_data['ActionList']:
+            if action not in seen:
+                print(f"{action:<30} {'-':<14} {'not run':>10}")
+
+        if timeline:
+            print(f"\nTotal workflow latency: {max(r['end'] for r in timeline) - self.trigger_time:.2f}s")
+        return timeline
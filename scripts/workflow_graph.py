@@ -0,0 +1,243 @@
+"""
+Workflow graph helpers shared by the FaaSr CLI scripts: rank parsing,
+adjacency/rank construction and DAG validation
+"""
+
+import logging
+import sys
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+def extract_rank(str_input):
+    """
+    Returns action name and rank of an action with rank (e.g func(7) returns (func, 7))
+
+    Arguments:
+        str_input: function name with rank
+    Returns:
+        (str, int) -- action name and rank
+    """
+    parts = str_input.split("(")
+    if len(parts) != 2 or not parts[1].endswith(")"):
+        return str_input, 1
+    rank = int(parts[1][:-1])
+    action_name = parts[0]
+    return (action_name, rank)
+
+def is_cyclic(adj_graph, curr, visited, stack):
+    """
+    Recursive function that if there is a cycle in a directed
+    graph defined by an adjacency list
+
+    Arguments:
+        adj_graph: adjacency list for graph (dict)
+        curr: current node
+        visited: set of visited nodes (set)
+        stack: list of nodes in recursion call stack (list)
+
+    Returns:
+        bool: True if cycle exists, False otherwise
+    """
+    # if the current node is in the recursion call
+    # stack then there must be a cycle in the graph
+    if curr in stack:
+        return True
+
+    # add current node to recursion call stack and visited set
+    visited.add(curr)
+    stack.append(curr)
+
+    # check each successor for cycles, recursively calling is_cyclic()
+    for child in adj_graph[curr]:
+        if child not in visited and is_cyclic(adj_graph, child, visited, stack):
+            logger.error(f"Function loop found from node {curr} to {child}")
+            sys.exit(1)
+        elif child in stack:
+            logger.error(f"Function loop found from node {curr} to {child}")
+            sys.exit(1)
+
+    # no more successors to visit for this branch and no cycles found
+    # remove current node from recursion call stack
+    stack.pop()
+    return False
+
+def build_adjacency_graph(payload):
+    """
+    This function builds an adjacency list for the FaaSr workflow graph and determines
+    the ranks of each action
+
+    Arguments:
+        payload: FaaSr payload dict
+    Returns:
+        adj_graph: dict of predecessor: successor pairs
+        rank: dict of each action's rank
+    """
+    adj_graph = defaultdict(list)
+    ranks = dict()
+
+    # Build adjacency list from ActionList
+    for func in payload["ActionList"].keys():
+        invoke_next = payload["ActionList"][func]["InvokeNext"]
+        if isinstance(invoke_next, str):
+            invoke_next = [invoke_next]
+        for child in invoke_next:
+
+            def process_action(action):
+                action_name, action_rank = extract_rank(action)
+                if action_name in ranks and ranks[action_name] > 1:
+                    err_msg = "Function with rank cannot have multiple predecessors"
+                    logger.error(err_msg)
+                    sys.exit(1)
+                else:
+                    adj_graph[func].append(action_name)
+                    ranks[action_name] = action_rank
+
+            if isinstance(child, dict):
+                for conditional_branch in child.values():
+                    for action in conditional_branch:
+                        process_action(action)
+            else:
+                process_action(child)
+
+    for func in adj_graph:
+        if func not in ranks:
+            ranks[func] = 0
+
+    return (adj_graph, ranks)
+
+def unconditional_actions(payload):
+    """
+    Returns the actions reached from FunctionInvoke through unconditional
+    InvokeNext entries only, i.e. the ones that run on every invocation.
+    Actions behind a conditional branch ({"True": [...]}) are left out unless
+    an unconditional path also reaches them.
+
+    Arguments:
+        payload: FaaSr payload dict
+    Returns:
+        set of action names
+    """
+    reached = set()
+    pending = [payload["FunctionInvoke"]]
+    while pending:
+        func = pending.pop()
+        if func in reached or func not in payload["ActionList"]:
+            continue
+        reached.add(func)
+        invoke_next = payload["ActionList"][func].get("InvokeNext", [])
+        if isinstance(invoke_next, str):
+            invoke_next = [invoke_next]
+        for child in invoke_next:
+            if not isinstance(child, dict):
+                pending.append(extract_rank(child)[0])
+    return reached
+
+def ranked_actions(payload):
+    """
+    Returns the actions that run as several ranked instances per invocation
+    (invoked as func(n) with n > 1)
+
+    Arguments:
+        payload: FaaSr payload dict
+    Returns:
+        set of action names
+    """
+    ranked = set()
+    for action_data in payload["ActionList"].values():
+        invoke_next = action_data.get("InvokeNext", [])
+        if isinstance(invoke_next, str):
+            invoke_next = [invoke_next]
+        for child in invoke_next:
+            for action in (sum(child.values(), []) if isinstance(child, dict) else [child]):
+                action_name, action_rank = extract_rank(action)
+                if action_rank > 1:
+                    ranked.add(action_name)
+    return ranked
+
+def predecessors_list(adj_graph):
+    """This function returns a map of action predecessor pairs
+
+    Arguments:
+        adj_graph: adjacency list for graph -- dict(function: successor)
+    """
+    pre = defaultdict(list)
+    for func1 in adj_graph:
+        for func2 in adj_graph[func1]:
+            pre[func2].append(func1)
+    return pre
+
+def ranked_predecessors(pre, ranks, func):
+    """
+    Returns the predecessors of an action, expanding ranked predecessors into
+    one entry per rank (e.g. func(3) becomes func.1, func.2, func.3)
+
+    Arguments:
+        pre: map of action predecessors -- dict(function: [predecessors])
+        ranks: dict of each action's rank
+        func: action name
+    Returns:
+        list of predecessor names
+    """
+    real_pre = []
+    for p in pre[func]:
+        if p in ranks and ranks[p] > 1:
+            for i in range(1, ranks[p] + 1):
+                real_pre.append(f"{p}.{i}")
+        else:
+            real_pre.append(p)
+    return real_pre
+
+def check_dag(faasr_payload):
+    """
+    This method checks for cycles, repeated function names,
+    or unreachable nodes in the workflow and aborts if it finds any
+
+    Arguments:
+        payload: FaaSr payload dict
+    Returns:
+        predecessors: dict -- map of function predecessors
+    """
+    if faasr_payload["FunctionInvoke"] not in faasr_payload["ActionList"]:
+        err_msg = "FunctionInvoke does not refer to a valid function"
+        logger.error(err_msg)
+        sys.exit(1)
+
+    adj_graph, ranks = build_adjacency_graph(faasr_payload)
+
+    # Initialize empty recursion call stack
+    stack = []
+
+    # Initialize empty visited set
+    visited = set()
+
+    # Find initial function in the graph
+    start = False
+    for func in faasr_payload["ActionList"]:
+        if ranks[func] == 0:
+            start = True
+            # This function stores the first function with no predecessors
+            # In the cases where there is multiple functions with no
+            # predecessors, an unreachable state error will occur later
+            first_func = func
+            break
+
+    # Ensure there is an initial action
+    if start is False:
+        logger.error("Function loop found: no initial action")
+        sys.exit(1)
+
+    # Check for cycles
+    is_cyclic(adj_graph, first_func, visited, stack)
+
+    # Check if all of the functions have been visited by the DFS
+    # If not, then there is an unreachable state in the graph
+    for func in faasr_payload["ActionList"]:
+        if func.split(".")[0] not in visited:
+            logger.error(f"Unreachable state found: {func}")
+            sys.exit(1)
+
+    # Initialize predecessor list
+    pre = predecessors_list(adj_graph)
+
+    return ranked_predecessors(pre, ranks, faasr_payload["FunctionInvoke"])